@@ -13,8 +13,11 @@ logger = logging.getLogger(__name__)
 class ConfigManager:
     """Manages configuration settings for playback parameters."""
     
-    def __init__(self, config_path: str = "config/settings.json"):
+    def __init__(self, config_path: str = "config/settings.json", persist: bool = True):
         self.config_path = config_path
+        # persist=False keeps settings in memory only: nothing is read from or
+        # written to config_path
+        self.persist = persist
         self.settings: Dict[str, Any] = {}
         
         # Default settings
@@ -35,6 +38,10 @@ class ConfigManager:
     
     def load_settings(self):
         """Load settings from JSON file."""
+        if not self.persist:
+            self.settings = self.defaults.copy()
+            return
+        
         try:
             if os.path.exists(self.config_path):
                 with open(self.config_path, 'r') as f:
@@ -56,6 +63,9 @@ class ConfigManager:
     
     def save_settings(self):
         """Save current settings to JSON file."""
+        if not self.persist:
+            return
+        
         try:
             # Ensure config directory exists
             os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
@@ -165,9 +175,19 @@ class CrossfadeManager:
         self.crossfade_start_time = 0
         self.old_frame: Optional[Any] = None
         self.crossfade_alpha = 0.0
+        # Two reusable snapshot buffers: a new fade writes the slot the
+        # current fade is not blending from
+        self._old_frame_bufs: list = [None, None]
+        self._old_frame_slot = 0
+        # Blend output buffer, allocated on first use and reused every frame
+        self._blend_buf: Optional[Any] = None
     
     def start_crossfade(self, old_frame: Any):
-        """Start a crossfade transition."""
+        """Start a crossfade transition.
+        
+        old_frame is copied into a buffer owned by the manager, so callers
+        can pass a frame they will keep reusing.
+        """
         duration_ms = self.config.get_crossfade_duration_ms()
         
         if duration_ms <= 0:
@@ -175,15 +195,28 @@ class CrossfadeManager:
             self.is_crossfading = False
             return
         
+        import numpy as np
+        
+        self._old_frame_slot ^= 1
+        buf = self._old_frame_bufs[self._old_frame_slot]
+        if buf is None or buf.shape != old_frame.shape or buf.dtype != old_frame.dtype:
+            buf = self._old_frame_bufs[self._old_frame_slot] = np.empty_like(old_frame)
+        np.copyto(buf, old_frame)
+        
         self.is_crossfading = True
         self.crossfade_start_time = self._get_time_ms()
-        self.old_frame = old_frame
+        self.old_frame = buf
         self.crossfade_alpha = 1.0  # Start with old frame fully visible
         
         logger.debug(f"Started crossfade transition ({duration_ms}ms)")
     
-    def update_crossfade(self, new_frame: Any) -> Any:
-        """Update crossfade and return blended frame."""
+    def update_crossfade(self, new_frame: Any, out: Any = None) -> Any:
+        """Update crossfade and return blended frame.
+        
+        If out is given (same shape/dtype as new_frame) the blend is written
+        into it; otherwise it goes into a buffer owned by the manager, which
+        is overwritten by the next call.
+        """
         if not self.is_crossfading or self.old_frame is None:
             return new_frame
         
@@ -211,11 +244,29 @@ class CrossfadeManager:
                 self.old_frame = cv2.resize(self.old_frame, 
                                           (new_frame.shape[1], new_frame.shape[0]))
             
-            # Alpha blend: result = alpha * old + (1-alpha) * new
+            # Quantize alpha to 8 bits: 256 steps are visually lossless for a fade,
+            # and at either end (weight rounds to 0 or 256) the blend is skipped
+            alpha_q8 = round(self.crossfade_alpha * 256)
+            if alpha_q8 == 0:
+                return new_frame
+            
+            if out is None:
+                if (self._blend_buf is None or self._blend_buf.shape != new_frame.shape
+                        or self._blend_buf.dtype != new_frame.dtype):
+                    self._blend_buf = np.empty_like(new_frame)
+                out = self._blend_buf
+            
+            if alpha_q8 >= 256:
+                # Old frame still fully visible: copy it rather than aliasing the
+                # snapshot, since callers may draw on the returned frame
+                np.copyto(out, self.old_frame)
+                return out
+            
+            # Alpha blend in one fused pass: result = alpha * old + (1-alpha) * new
             blended = cv2.addWeighted(
-                self.old_frame, self.crossfade_alpha,
-                new_frame, 1.0 - self.crossfade_alpha,
-                0
+                self.old_frame, alpha_q8 / 256.0,
+                new_frame, (256 - alpha_q8) / 256.0,
+                0, dst=out
             )
             
             return blended
@@ -340,16 +391,14 @@ class ParameterAdjustmentUI:
         try:
             import cv2
             
-            # UI background
-            overlay = image.copy()
+            # UI background: darken only the panel in place (80% of a (40, 40, 40) fill)
             ui_height = 200
             ui_width = 400
             ui_x = 50
             ui_y = 50
             
-            cv2.rectangle(overlay, (ui_x, ui_y), (ui_x + ui_width, ui_y + ui_height), 
-                         (40, 40, 40), -1)
-            cv2.addWeighted(overlay, 0.8, image, 0.2, 0, image)
+            panel = image[ui_y:ui_y + ui_height + 1, ui_x:ui_x + ui_width + 1]
+            cv2.addWeighted(panel, 0.2, panel, 0, 0.8 * 40, dst=panel)
             
             # Title
             cv2.putText(image, "Playback Parameters", (ui_x + 10, ui_y + 30),
@@ -388,8 +437,17 @@ def test_config_manager():
     """Test configuration manager functionality."""
     print("Testing ConfigManager...")
     
-    # Test with temporary config file
-    config = ConfigManager("config/test_config.json")
+    import tempfile
+    
+    # Test with a config file in a private temp dir, so runs don't see each other's saves
+    with tempfile.TemporaryDirectory() as temp_dir:
+        _check_config_manager(os.path.join(temp_dir, "test_config.json"))
+    
+    print("✅ ConfigManager tests passed")
+
+def _check_config_manager(config_path: str):
+    """Exercise defaults, bounds and save/load against config_path."""
+    config = ConfigManager(config_path)
     
     # Test default values
     assert config.get_crossfade_duration_ms() == 200, "Default crossfade should be 200ms"
@@ -407,10 +465,8 @@ def test_config_manager():
     
     # Test save/load
     config.save_settings()
-    config2 = ConfigManager("config/test_config.json")
+    config2 = ConfigManager(config_path)
     assert config2.get_crossfade_duration_ms() == config.get_crossfade_duration_ms(), "Settings should persist"
-    
-    print("✅ ConfigManager tests passed")
 
 if __name__ == "__main__":
     test_config_manager()
@@ -6,10 +6,11 @@ import logging
 import time
 import threading
 import traceback
+from collections import deque
 from typing import Optional, Callable, Dict, Any, List
 from enum import Enum
-from dataclasses import dataclass
-from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+from datetime import datetime
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -31,7 +32,6 @@ class SystemState(Enum):
 @dataclass
 class ErrorEvent:
     """Represents an error event in the system."""
-    timestamp: datetime
     component: str
     error_type: str
     severity: ErrorSeverity
@@ -40,24 +40,37 @@ class ErrorEvent:
     context: Optional[Dict[str, Any]] = None
     resolved: bool = False
     resolution_time: Optional[datetime] = None
+    # Creation time as a float (time.time()); see the timestamp property
+    created: float = field(default_factory=time.time)
+    
+    @property
+    def timestamp(self) -> datetime:
+        """Creation time as a datetime, built only when asked for."""
+        return datetime.fromtimestamp(self.created)
 
 class ErrorCounter:
     """Tracks error frequency for circuit breaker pattern."""
     
     def __init__(self, threshold: int = 5, window_minutes: int = 5):
         self.threshold = threshold
-        self.window = timedelta(minutes=window_minutes)
-        self.errors: List[datetime] = []
+        self.window_seconds = window_minutes * 60.0
+        # Monotonic timestamps, oldest first, so expiry pops from the left
+        self.errors: deque = deque()
         self.lock = threading.Lock()
     
+    def _expire(self, now: float):
+        """Drop errors that fell out of the window (caller holds the lock)."""
+        cutoff = now - self.window_seconds
+        while self.errors and self.errors[0] <= cutoff:
+            self.errors.popleft()
+    
     def add_error(self) -> bool:
         """Add an error event. Returns True if threshold exceeded."""
         with self.lock:
-            now = datetime.now()
+            now = time.monotonic()
             
             # Remove old errors outside window
-            cutoff = now - self.window
-            self.errors = [err_time for err_time in self.errors if err_time > cutoff]
+            self._expire(now)
             
             # Add new error
             self.errors.append(now)
@@ -72,9 +85,7 @@ class ErrorCounter:
     def get_count(self) -> int:
         """Get current error count in window."""
         with self.lock:
-            now = datetime.now()
-            cutoff = now - self.window
-            self.errors = [err_time for err_time in self.errors if err_time > cutoff]
+            self._expire(time.monotonic())
             return len(self.errors)
 
 class FallbackManager:
@@ -253,6 +264,11 @@ class SystemMonitor:
         self.monitor_thread: Optional[threading.Thread] = None
         self.check_interval = 30  # seconds
         
+        # Set to wake the loop early on stop; ticks count completed check rounds
+        self._stop_event = threading.Event()
+        self._ticks = 0
+        self._tick_cond = threading.Condition()
+        
         # Health check functions
         self.health_checks = {
             "memory_usage": self._check_memory_usage,
@@ -267,6 +283,7 @@ class SystemMonitor:
             return
         
         self.monitoring = True
+        self._stop_event.clear()
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
         logger.info("System monitoring started")
@@ -274,6 +291,7 @@ class SystemMonitor:
     def stop_monitoring(self):
         """Stop system health monitoring."""
         self.monitoring = False
+        self._stop_event.set()
         if self.monitor_thread and self.monitor_thread.is_alive():
             self.monitor_thread.join(timeout=5.0)
         logger.info("System monitoring stopped")
@@ -295,12 +313,24 @@ class SystemMonitor:
                             exception=e
                         )
                 
-                # Sleep until next check
-                time.sleep(self.check_interval)
+                with self._tick_cond:
+                    self._ticks += 1
+                    self._tick_cond.notify_all()
+                
+                # Sleep until next check (or until stopped)
+                self._stop_event.wait(self.check_interval)
                 
             except Exception as e:
                 logger.error(f"Monitor loop error: {e}")
-                time.sleep(self.check_interval)
+                self._stop_event.wait(self.check_interval)
+    
+    def wait_for_ticks(self, count: int, timeout: Optional[float] = None) -> bool:
+        """Wait until at least count rounds of health checks have completed.
+        
+        Returns False if the timeout expires first.
+        """
+        with self._tick_cond:
+            return self._tick_cond.wait_for(lambda: self._ticks >= count, timeout)
     
     def _check_memory_usage(self):
         """Check system memory usage."""
@@ -388,19 +418,30 @@ class ErrorHandler:
     """Central error handling and recovery coordination."""
     
     def __init__(self):
-        self.error_history: List[ErrorEvent] = []
+        # Lock for thread safety
+        self.lock = threading.Lock()
+        
+        # Configuration
+        self.auto_recovery_enabled = True
+        
+        # Bounded history: appending past max_history_size drops the oldest event
+        self.error_history: deque = deque(maxlen=1000)
         self.error_counters: Dict[str, ErrorCounter] = {}
         self.fallback_manager = FallbackManager()
         self.system_monitor = SystemMonitor(self)
         self.system_state = SystemState.NORMAL
         self.error_callbacks: List[Callable[[ErrorEvent], None]] = []
-        
-        # Configuration
-        self.max_history_size = 1000
-        self.auto_recovery_enabled = True
-        
-        # Lock for thread safety
-        self.lock = threading.Lock()
+    
+    @property
+    def max_history_size(self) -> int:
+        """Maximum number of events kept in error_history."""
+        return self.error_history.maxlen
+    
+    @max_history_size.setter
+    def max_history_size(self, size: int):
+        # deque maxlen is fixed at construction; rebuild, keeping the newest events
+        with self.lock:
+            self.error_history = deque(self.error_history, maxlen=size)
     
     def add_error_callback(self, callback: Callable[[ErrorEvent], None]):
         """Add callback to be called when errors occur."""
@@ -413,7 +454,6 @@ class ErrorHandler:
         
         # Create error event
         error_event = ErrorEvent(
-            timestamp=datetime.now(),
             component=component,
             error_type=error_type,
             severity=severity,
@@ -424,13 +464,9 @@ class ErrorHandler:
         
         # Thread-safe error handling
         with self.lock:
-            # Add to history
+            # Add to history (deque maxlen trims the oldest)
             self.error_history.append(error_event)
             
-            # Trim history if needed
-            if len(self.error_history) > self.max_history_size:
-                self.error_history = self.error_history[-self.max_history_size:]
-            
             # Update error counter
             counter_key = f"{component}:{error_type}"
             if counter_key not in self.error_counters:
@@ -504,9 +540,10 @@ class ErrorHandler:
     def get_error_summary(self) -> Dict[str, Any]:
         """Get summary of recent errors and system health."""
         with self.lock:
+            cutoff = time.time() - 3600  # Last hour
             recent_errors = [
                 err for err in self.error_history
-                if err.timestamp > datetime.now() - timedelta(hours=1)
+                if err.created > cutoff
             ]
             
             error_counts = {}
@@ -5,7 +5,8 @@ Handles 6 quadrilateral masks for stair projection with drag-and-drop corner adj
 import json
 import os
 import logging
-from typing import List, Tuple, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, List, Tuple, Optional, Dict, Any
 import cv2
 import numpy as np
 
@@ -65,16 +66,36 @@ class StripMask:
                 return corner
         return None
     
+    def find_corners_at_points(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Vectorized find_corner_at_point for a batch of points.
+        
+        Returns, per point, the index of the first corner containing it
+        (same precedence as find_corner_at_point) or -1 if none does.
+        """
+        corner_xy = np.array([corner.position for corner in self.corners], dtype=np.int64)
+        radii_sq = np.array([corner.radius * corner.radius for corner in self.corners], dtype=np.int64)
+        dx = np.asarray(xs, dtype=np.int64)[:, None] - corner_xy[:, 0]
+        dy = np.asarray(ys, dtype=np.int64)[:, None] - corner_xy[:, 1]
+        hits = dx * dx + dy * dy <= radii_sq
+        return np.where(hits.any(axis=1), hits.argmax(axis=1), -1)
+    
     def get_mask_points(self) -> np.ndarray:
         """Get mask points as numpy array for OpenCV."""
         points = np.array(self.get_corner_positions(), dtype=np.int32)
         return points.reshape((-1, 1, 2))
     
-    def draw_mask(self, image: np.ndarray, alpha: float = 0.3, *, show_corners: bool = True):
-        """Draw mask overlay on image."""
+    def draw_mask(self, image: np.ndarray, alpha: float = 0.3, *, show_corners: bool = True,
+                  scale: float = 1.0):
+        """Draw mask overlay on image.
+
+        ``scale`` maps mask coordinates onto a canvas smaller (or larger) than
+        the projection frame, so editors can draw at display resolution.
+        """
         # Create mask overlay
         overlay = image.copy()
         points = self.get_mask_points()
+        if scale != 1.0:
+            points = np.rint(points * scale).astype(np.int32)
         cv2.fillPoly(overlay, [points], self.color)
 
         # Blend with original image
@@ -87,12 +108,14 @@ class StripMask:
         if show_corners:
             for i, corner in enumerate(self.corners):
                 color = (255, 255, 255) if corner.is_dragging else (200, 200, 200)
-                cv2.circle(image, corner.position, corner.radius, color, -1)
-                cv2.circle(image, corner.position, corner.radius, (0, 0, 0), 2)
+                cx, cy = int(round(corner.x * scale)), int(round(corner.y * scale))
+                radius = max(1, int(round(corner.radius * scale)))
+                cv2.circle(image, (cx, cy), radius, color, -1)
+                cv2.circle(image, (cx, cy), radius, (0, 0, 0), 2)
                 
                 # Corner number
                 cv2.putText(image, str(i), 
-                           (corner.x - 5, corner.y + 5), 
+                           (cx - 5, cy + 5), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
 
 class MaskManager:
@@ -110,6 +133,19 @@ class MaskManager:
         self.last_mouse_pos = (0, 0)
         self.active_width_handle: Optional[str] = None  # 'left', 'right'
         self.last_overlay_height = 1080
+
+        # Cached remap tables for apply_masks_to_frame (see _ensure_remap_tables)
+        self._remap_key: Optional[Tuple] = None
+        self._map_x: Optional[np.ndarray] = None
+        self._map_y: Optional[np.ndarray] = None
+        self._remap_pool: Optional[ThreadPoolExecutor] = None
+        self._output: Optional[np.ndarray] = None
+
+        # Run the remap through OpenCV's transparent API when OpenCL is usable
+        self.use_opencl = self._opencl_available()
+        self._umap_x: Optional[cv2.UMat] = None
+        self._umap_y: Optional[cv2.UMat] = None
+        self._uoutput: Optional[cv2.UMat] = None
         
         # Default mask configuration for 1920x1080 divided into 6 strips
         self.default_masks = self._create_default_masks()
@@ -145,10 +181,12 @@ class MaskManager:
         
         return masks
     
-    def load_masks(self):
-        """Load mask configuration from JSON file."""
+    def load_masks(self, fp: Optional[BinaryIO] = None):
+        """Load mask configuration from JSON file, or from fp if given."""
         try:
-            if os.path.exists(self.config_path):
+            if fp is not None:
+                mask_data = json.load(fp).get('strips', self.default_masks)
+            elif os.path.exists(self.config_path):
                 with open(self.config_path, 'r') as f:
                     data = json.load(f)
                     mask_data = data.get('strips', self.default_masks)
@@ -169,12 +207,9 @@ class MaskManager:
             # Fallback to defaults
             self.masks = [StripMask(i, mask['corners']) for i, mask in enumerate(self.default_masks)]
     
-    def save_masks(self):
-        """Save current mask configuration to JSON file."""
+    def save_masks(self, fp: Optional[BinaryIO] = None):
+        """Save current mask configuration to JSON file, or to fp if given."""
         try:
-            # Ensure config directory exists
-            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-            
             # Prepare data for saving
             data = {
                 "strips": [
@@ -183,6 +218,13 @@ class MaskManager:
                 ]
             }
             
+            if fp is not None:
+                fp.write(json.dumps(data).encode('utf-8'))
+                return
+            
+            # Ensure config directory exists
+            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
+            
             with open(self.config_path, 'w') as f:
                 json.dump(data, f, indent=2)
             
@@ -198,43 +240,159 @@ class MaskManager:
         return None
     
     def apply_masks_to_frame(self, frame: np.ndarray) -> np.ndarray:
-        """Apply all masks to create masked output for projection."""
+        """Apply all masks to create masked output for projection.
+
+        The per-strip perspective warps are folded into a single remap whose
+        lookup tables are rebuilt only when the mask geometry or frame size
+        changes, so steady-state playback costs one remap per frame.
+
+        The returned array is a buffer owned by the manager and is
+        overwritten by the next call; copy it if it must outlive the frame.
+        """
         if not self.masks:
             return frame
         try:
             h, w = frame.shape[:2]
-            output = np.zeros_like(frame)
-            transforms = self.get_projection_transforms()
-            
-            for i, transform in enumerate(transforms):
-                # Warp the full frame using the strip-specific transform
-                warped = cv2.warpPerspective(frame, transform, (w, h))
-                
-                # Create mask for destination quadrilateral
-                dst_points = np.array(self.masks[i].get_corner_positions(), dtype=np.int32).reshape((-1, 1, 2))
-                mask = np.zeros((h, w), dtype=np.uint8)
-                cv2.fillPoly(mask, [dst_points], 255)
-                
-                # Composite warped strip into output using the mask
-                roi = output.copy()
-                roi[mask == 255] = warped[mask == 255]
-                output = roi
-            
-            return output
+            self._ensure_remap_tables(h, w)
+            if self._output is None or self._output.shape != frame.shape or self._output.dtype != frame.dtype:
+                self._output = np.empty_like(frame)
+            if self.use_opencl:
+                try:
+                    return self._remap_opencl(frame)
+                except cv2.error as e:
+                    logger.warning(f"OpenCL remap failed, using CPU path: {e}")
+                    self.use_opencl = False
+            return cv2.remap(frame, self._map_x, self._map_y, cv2.INTER_LINEAR,
+                             dst=self._output,
+                             borderMode=cv2.BORDER_CONSTANT, borderValue=0)
         except Exception as e:
             logger.error(f"Error applying masks to frame: {e}")
             return frame
+
+    def _geometry_key(self, h: int, w: int) -> Tuple:
+        """Snapshot of everything the remap tables depend on."""
+        return (h, w, tuple(tuple(mask.get_corner_positions()) for mask in self.masks))
+
+    def _ensure_remap_tables(self, h: int, w: int):
+        """Rebuild the combined strip remap tables if the geometry changed."""
+        key = self._geometry_key(h, w)
+        if key == self._remap_key:
+            return
+
+        # Tables are rewritten in place; invalidate until the rebuild completes
+        self._remap_key = None
+
+        # Uncovered pixels map outside the source and render black
+        if self._map_x is None or self._map_x.shape != (h, w):
+            self._map_x = np.empty((h, w), dtype=np.float32)
+            self._map_y = np.empty((h, w), dtype=np.float32)
+        map_x, map_y = self._map_x, self._map_y
+        map_x.fill(-1)
+        map_y.fill(-1)
+
+        # Strip tables are independent; compute them in parallel (OpenCV and
+        # NumPy release the GIL) and composite serially. Later strips
+        # overwrite earlier ones, matching the compositing order.
+        jobs = [self._get_remap_pool().submit(self._compute_strip_remap, mask, transform, h, w)
+                for mask, transform in zip(self.masks, self.get_projection_transforms())]
+        for job in jobs:
+            result = job.result()
+            if result is None:
+                continue
+            rows, cols, covered, src_x, src_y = result
+            map_x[rows, cols][covered] = src_x[covered]
+            map_y[rows, cols][covered] = src_y[covered]
+
+        self._umap_x = None
+        self._umap_y = None
+        self._remap_key = key
+
+    @staticmethod
+    def _opencl_available() -> bool:
+        """Return True if OpenCV can dispatch UMat work to an OpenCL device."""
+        try:
+            return cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+        except Exception:
+            return False
+
+    def _remap_opencl(self, frame: np.ndarray) -> np.ndarray:
+        """Remap via UMat so the work runs on the OpenCL device."""
+        if self._umap_x is None or self._umap_y is None:
+            # Upload the tables once per geometry change, not per frame
+            self._umap_x = cv2.UMat(self._map_x)
+            self._umap_y = cv2.UMat(self._map_y)
+        self._uoutput = cv2.remap(cv2.UMat(frame), self._umap_x, self._umap_y, cv2.INTER_LINEAR,
+                                  dst=self._uoutput,
+                                  borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        # UMat.get() cannot download into an existing array; copy so callers
+        # always receive the same preallocated buffer as on the CPU path
+        np.copyto(self._output, self._uoutput.get())
+        return self._output
+
+    def _get_remap_pool(self) -> ThreadPoolExecutor:
+        """Lazily create the worker pool used for remap table rebuilds."""
+        if self._remap_pool is None:
+            workers = max(1, min(6, os.cpu_count() or 1))
+            self._remap_pool = ThreadPoolExecutor(max_workers=workers,
+                                                  thread_name_prefix="mask-remap")
+        return self._remap_pool
+
+    @staticmethod
+    def _compute_strip_remap(mask: StripMask, transform: np.ndarray, h: int, w: int):
+        """Compute source coordinates for pixels inside one strip's quadrilateral.
+
+        Returns (rows, cols, covered, src_x, src_y) for the strip's clipped
+        bounding box, or None if the strip lies entirely off-frame.
+        """
+        points = mask.get_mask_points()
+        x, y, bw, bh = cv2.boundingRect(points)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + bw, w), min(y + bh, h)
+        if x1 <= x0 or y1 <= y0:
+            return None
+
+        region = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.fillPoly(region, [points], 255, offset=(-x0, -y0))
+        covered = region == 255
+
+        # Inverse homography maps destination pixels back into the source frame
+        inverse = np.linalg.inv(transform)
+        gx, gy = np.meshgrid(np.arange(x0, x1, dtype=np.float64),
+                             np.arange(y0, y1, dtype=np.float64))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            denom = inverse[2, 0] * gx + inverse[2, 1] * gy + inverse[2, 2]
+            src_x = (inverse[0, 0] * gx + inverse[0, 1] * gy + inverse[0, 2]) / denom
+            src_y = (inverse[1, 0] * gx + inverse[1, 1] * gy + inverse[1, 2]) / denom
+        covered &= np.isfinite(src_x) & np.isfinite(src_y)
+
+        return slice(y0, y1), slice(x0, x1), covered, src_x, src_y
+
+    def prepare(self, height: int, width: int):
+        """Build the remap tables for a frame size ahead of the first frame."""
+        if self.masks:
+            self._ensure_remap_tables(height, width)
+
+    def shutdown(self):
+        """Release the remap worker pool."""
+        if self._remap_pool is not None:
+            self._remap_pool.shutdown(wait=False)
+            self._remap_pool = None
     
-    def draw_edit_overlay(self, image: np.ndarray):
-        """Draw editing overlay with all masks and controls."""
+    def draw_edit_overlay(self, image: np.ndarray, scale: float = 1.0):
+        """Draw editing overlay with all masks and controls.
+
+        ``scale`` is the ratio of ``image`` to the projection frame; pass it
+        when drawing onto a downscaled preview instead of the full frame.
+        """
         if not self.is_editing:
             return
 
-        self.last_overlay_height = image.shape[0]
+        # Hit-testing works in projection coordinates, so record the full height
+        self.last_overlay_height = int(round(image.shape[0] / scale))
 
         # Draw all masks
         for mask in self.masks:
-            mask.draw_mask(image, alpha=0.2, show_corners=self.edit_mode == 'corners')
+            mask.draw_mask(image, alpha=0.2, show_corners=self.edit_mode == 'corners', scale=scale)
 
         # Draw strip labels
         for i, mask in enumerate(self.masks):
@@ -242,6 +400,7 @@ class MaskManager:
             corners = mask.get_corner_positions()
             center_x = sum(x for x, y in corners) // len(corners)
             center_y = sum(y for x, y in corners) // len(corners)
+            center_x, center_y = int(center_x * scale), int(center_y * scale)
             
             # Strip label
             label = f"Stair {i + 1}"
@@ -268,7 +427,7 @@ class MaskManager:
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
 
         if self.edit_mode == 'width':
-            self._draw_width_mode_controls(image)
+            self._draw_width_mode_controls(image, scale)
 
     def handle_mouse_event(self, event: int, x: int, y: int, flags: int, param):
         """Handle mouse events for drag-and-drop corner adjustment."""
@@ -477,10 +636,14 @@ class MaskManager:
         right_x = int(round(center + half_width))
         return (left_x, mid_y), (right_x, mid_y)
 
-    def _draw_width_mode_controls(self, image: np.ndarray):
+    def _draw_width_mode_controls(self, image: np.ndarray, scale: float = 1.0):
         """Render width crop handles and helper visuals."""
         h, w = image.shape[:2]
-        left_pos, right_pos = self._get_width_handle_positions(h)
+        left_pos, right_pos = self._get_width_handle_positions(self.last_overlay_height)
+        if scale != 1.0:
+            left_pos = (int(round(left_pos[0] * scale)), h // 2)
+            right_pos = (int(round(right_pos[0] * scale)), h // 2)
+        radius = max(1, int(round(self.width_mode_handle_radius * scale)))
 
         # Vertical markers
         cv2.line(image, (left_pos[0], 0), (left_pos[0], h), (255, 255, 255), 1)
@@ -488,8 +651,8 @@ class MaskManager:
 
         # Handle circles
         for pos in (left_pos, right_pos):
-            cv2.circle(image, pos, self.width_mode_handle_radius, (255, 255, 255), -1)
-            cv2.circle(image, pos, self.width_mode_handle_radius, (0, 0, 0), 2)
+            cv2.circle(image, pos, radius, (255, 255, 255), -1)
+            cv2.circle(image, pos, radius, (0, 0, 0), 2)
 
         width_px = int(round(self.width_mode_half_width * 2)) if self.width_mode_half_width else 0
         label = f"Width: {width_px}px"
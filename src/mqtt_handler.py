@@ -2,44 +2,214 @@
 MQTT handler for Halloween Projection Mapper.
 Manages controller communication and state-based video switching.
 """
+import asyncio
+import contextlib
 import json
 import threading
 import time
 import logging
-from typing import Optional, Callable, Dict, Any
+from types import SimpleNamespace
+from typing import Optional, Callable, Dict, Any, List, Tuple, Union
 import paho.mqtt.client as mqtt
+from paho.mqtt.subscribeoptions import SubscribeOptions
+from net_tuning import SOCKET_OPTIONS, tune_socket
+
+# Prefer orjson for per-message JSON work; stdlib json is the fallback
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+# Optional precompiled schema for playback payloads (no intermediate dict)
+try:
+    import msgspec
+
+    class PlaybackPayload(msgspec.Struct):
+        """Controller payload fields; unknown keys are skipped while decoding."""
+        state: Union[str, None, msgspec.UnsetType] = msgspec.UNSET
+        media: Optional[str] = None
+        animation: Optional[str] = None
+
+    _PLAYBACK_DECODER = msgspec.json.Decoder(PlaybackPayload)
+    HAS_MSGSPEC = True
+except ImportError:
+    msgspec = None
+    HAS_MSGSPEC = False
+
+# Optional asyncio MQTT client; MQTTHandler's paho thread is the fallback
+try:
+    import aiomqtt
+    HAS_AIOMQTT = True
+except ImportError:
+    aiomqtt = None
+    HAS_AIOMQTT = False
+
+# Optional faster event loop for AsyncMQTTHandler
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    uvloop = None
+    HAS_UVLOOP = False
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Playback states accepted from the controller
+_VALID_STATES = frozenset(('active', 'ambient'))
+
+def _json_loads(payload: Union[bytes, memoryview]) -> Any:
+    """Parse a JSON payload straight from the raw MQTT bytes (or a view of them)."""
+    if HAS_ORJSON:
+        return orjson.loads(payload)
+    # stdlib json rejects memoryview; bytes(bytes) is a no-op
+    return json.loads(bytes(payload))
+
+def _json_dumps(data: Any) -> bytes:
+    """Serialize data to compact JSON bytes ready for publishing."""
+    if HAS_ORJSON:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode('utf-8')
+
+# Exact byte layout the controller firmware emits: {"state":"...","media":"..."}
+_STATE_PREFIX = b'{"state":"'
+_MEDIA_SEPARATOR = b'","media":"'
+_STATE_ONLY_SUFFIXES = frozenset((b'"}', b'","media":null}'))
+_VALID_STATE_BYTES = {state.encode(): state for state in _VALID_STATES}
+
+def _try_fast_parse(payload: Union[bytes, memoryview]) -> Optional[Tuple[str, Optional[str]]]:
+    """Slice (state, media) out of a compact controller payload without building a dict.
+    
+    Only used by _decode_playback in stdlib-only installs (neither msgspec nor
+    orjson), where it beats json.loads; both native decoders beat it.
+    Returns None whenever the payload deviates from the expected layout
+    (whitespace, other keys, escapes, unknown state) so the caller can use
+    the generic parser.
+    """
+    if payload[:len(_STATE_PREFIX)] != _STATE_PREFIX:
+        return None
+    # Views are only copied once the prefix matches
+    payload = bytes(payload)
+    if b'\\' in payload:
+        return None
+    
+    state_end = payload.find(b'"', len(_STATE_PREFIX))
+    state = _VALID_STATE_BYTES.get(payload[len(_STATE_PREFIX):state_end])
+    if state is None:
+        return None
+    
+    rest = payload[state_end:]
+    if rest in _STATE_ONLY_SUFFIXES:
+        return state, None
+    if not (rest.startswith(_MEDIA_SEPARATOR) and rest.endswith(b'"}')):
+        return None
+    
+    media = rest[len(_MEDIA_SEPARATOR):-2]
+    if b'"' in media:
+        return None
+    try:
+        return state, media.decode('utf-8') or None
+    except UnicodeDecodeError:
+        return None
+
+def _decode_playback(payload: Union[bytes, memoryview]) -> Optional[Tuple[Any, Optional[str]]]:
+    """Extract (state, media) from a playback payload, honoring the 'animation' alias.
+
+    Decoder preference: msgspec, then orjson, then (stdlib only) the
+    _try_fast_parse byte slicer ahead of json.loads. Returns None for
+    status/heartbeat payloads without a 'state' field (or that aren't JSON
+    objects) and raises json.JSONDecodeError or UnicodeDecodeError for
+    malformed payloads.
+    """
+    if HAS_MSGSPEC:
+        try:
+            message = _PLAYBACK_DECODER.decode(payload)
+            if message.state is msgspec.UNSET:
+                return None
+            return message.state, message.media or message.animation
+        except msgspec.DecodeError:
+            # Unusual shapes/types take the generic path below
+            pass
+    elif not HAS_ORJSON:
+        # Stdlib-only fallback: slicing the known layout is faster than json.loads
+        fast = _try_fast_parse(payload)
+        if fast is not None:
+            return fast
+    
+    data = _json_loads(payload)
+    if not isinstance(data, dict) or 'state' not in data:
+        return None
+    return data.get('state'), data.get('media') or data.get('animation')
+
 class MQTTHandler:
     """Handles MQTT communication with the upstream controller for state/media control."""
     
+    # Fixed attribute layout: no per-instance __dict__ (state/media/time live in _snapshot)
+    __slots__ = (
+        'broker_host', 'broker_port', 'topic', 'timeout_seconds',
+        '_broker_addr', '_status_topic', '_connect_log_msg', 'use_mqtt5',
+        'client', 'is_connected', '_connected_event', '_network_thread',
+        'message_callback', '_snapshot',
+        '_timeout_timer', '_timeout_active', '_timer_lock', 'transport',
+    )
+    
     def __init__(self, 
                  broker_host: str = "localhost",
                  broker_port: int = 1883,
                  topic: str = "halloween/playback",
-                 timeout_seconds: int = 60):
+                 timeout_seconds: int = 60,
+                 use_mqtt5: bool = True,
+                 transport: Optional["LoopbackBridge"] = None):
         
         self.broker_host = broker_host
         self.broker_port = broker_port
         self.topic = topic
+        # In-process bridge replacing the broker connection (tests)
+        self.transport = transport
         self.timeout_seconds = timeout_seconds
+        # Fixed for the handler's lifetime; formatted once
+        self._broker_addr = f"{broker_host}:{broker_port}"
+        self._status_topic = f"{topic}/status"
+        self._connect_log_msg = f"Connecting to MQTT broker at {self._broker_addr}"
+        # MQTT v5 lets us drop our own publishes broker-side; v3.1.1 for older brokers
+        self.use_mqtt5 = use_mqtt5
         
         # MQTT client
         self.client: Optional[mqtt.Client] = None
         self.is_connected = False
+        self._connected_event = threading.Event()
+        self._network_thread: Optional[threading.Thread] = None
         
         # Message handling
         self.message_callback: Optional[Callable[[str, str], None]] = None
-        self.last_message_time = 0
-        self.current_state = "ambient"
-        self.current_media = None
+        # (state, media, last_message_time as time.monotonic()) swapped as one tuple so readers on
+        # other threads always see a consistent set without locking
+        self._snapshot: Tuple[str, Optional[str], float] = ("ambient", None, 0)
         
-        # Timeout monitoring
-        self.timeout_thread: Optional[threading.Thread] = None
-        self.should_monitor_timeout = False
+        # Timeout monitoring: a one-shot timer re-armed on every valid message
+        self._timeout_timer: Optional[threading.Timer] = None
+        self._timeout_active = False
+        self._timer_lock = threading.Lock()
         
+    @property
+    def current_state(self) -> str:
+        return self._snapshot[0]
+    
+    @property
+    def current_media(self) -> Optional[str]:
+        return self._snapshot[1]
+    
+    @property
+    def last_message_time(self) -> float:
+        return self._snapshot[2]
+    
+    @last_message_time.setter
+    def last_message_time(self, value: float):
+        state, media, _ = self._snapshot
+        self._snapshot = (state, media, value)
+    
     def set_message_callback(self, callback: Callable[[str, str], None]):
         """Set callback function for handling state/media messages.
         
@@ -50,42 +220,50 @@ class MQTTHandler:
     
     def connect(self) -> bool:
         """Connect to MQTT broker."""
+        if self.transport is not None:
+            self.client = self.transport.client(self._on_message)
+            self._on_connect(self.client, None, {}, 0)
+            return True
+        
         try:
             # Create MQTT client
             self.client = mqtt.Client(
                 client_id="halloween_projection_mapper",
-                protocol=mqtt.MQTTv311
+                protocol=mqtt.MQTTv5 if self.use_mqtt5 else mqtt.MQTTv311
             )
             
+            # Log callback exceptions instead of letting them end loop_forever
+            self.client.suppress_exceptions = True
+            self.client.enable_logger(logger)
+            
             # Set callbacks
+            self.client.on_socket_open = tune_socket
             self.client.on_connect = self._on_connect
             self.client.on_disconnect = self._on_disconnect
             self.client.on_message = self._on_message
             
             # Connect to broker
-            logger.info(f"Connecting to MQTT broker at {self.broker_host}:{self.broker_port}")
-            # Configure automatic reconnect backoff if available
-            try:
-                self.client.reconnect_delay_set(min_delay=1, max_delay=30)
-            except Exception:
-                pass
-            self.client.connect(self.broker_host, self.broker_port, 60)
+            logger.info(self._connect_log_msg)
+            # Paho's loop owns reconnects, backing off between attempts
+            self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+            self.client.connect_async(self.broker_host, self.broker_port, 60)
             
-            # Start networking loop
-            self.client.loop_start()
+            # Single networking thread; it also retries until the broker is reachable
+            self._network_thread = threading.Thread(
+                target=self.client.loop_forever,
+                kwargs={'retry_first_connection': True},
+                name="mqtt-handler",
+                daemon=True
+            )
+            self._network_thread.start()
             
-            # Wait for connection
+            # Wait for CONNACK (set by _on_connect)
             connect_timeout = 10  # seconds
-            start_time = time.time()
-            while not self.is_connected and (time.time() - start_time) < connect_timeout:
-                time.sleep(0.1)
-            
-            if self.is_connected:
+            if self._connected_event.wait(timeout=connect_timeout):
                 logger.info("MQTT connection established")
-                self._start_timeout_monitoring()
                 return True
             else:
-                logger.error("MQTT connection timeout")
+                logger.error("MQTT connection timeout (will keep retrying in background)")
                 return False
                 
         except Exception as e:
@@ -94,157 +272,143 @@ class MQTTHandler:
     
     def disconnect(self):
         """Disconnect from MQTT broker."""
-        self._stop_timeout_monitoring()
+        self._cancel_timeout()
         
         if self.client:
             logger.info("Disconnecting from MQTT broker")
-            self.client.loop_stop()
             self.client.disconnect()
+            if self._network_thread and self._network_thread.is_alive():
+                self._network_thread.join(timeout=2.0)
+            self._network_thread = None
             self.client = None
         
         self.is_connected = False
+        self._connected_event.clear()
     
-    def _on_connect(self, client, userdata, flags, rc):
-        """Callback for MQTT connection."""
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
+        """Callback for MQTT connection (properties is only passed under MQTT v5)."""
         if rc == 0:
             self.is_connected = True
+            self._connected_event.set()
             logger.info(f"Connected to MQTT broker, subscribing to {self.topic}")
             
-            # Subscribe to Halloween playback topic
-            client.subscribe(self.topic)
+            # Subscribe to Halloween playback topic; under v5 the broker
+            # never echoes our own publishes (e.g. publish_status) back to us
+            if self.use_mqtt5:
+                client.subscribe(self.topic, options=SubscribeOptions(
+                    qos=0, noLocal=True, retainAsPublished=False))
+            else:
+                client.subscribe(self.topic, qos=0)
             
             # Update last message time to prevent immediate timeout
-            self.last_message_time = time.time()
+            self.last_message_time = time.monotonic()
+            self._timeout_active = True
+            self._arm_timeout()
             
         else:
             logger.error(f"MQTT connection failed with code {rc}")
             self.is_connected = False
     
-    def _on_disconnect(self, client, userdata, rc):
+    def _on_disconnect(self, client, userdata, rc, properties=None):
         """Callback for MQTT disconnection."""
         self.is_connected = False
+        self._connected_event.clear()
         if rc != 0:
-            logger.warning(f"Unexpected MQTT disconnection (code {rc})")
+            # No reconnect thread here: loop_forever reconnects with the configured backoff
+            logger.warning(f"Unexpected MQTT disconnection (code {rc}), paho will reconnect")
         else:
             logger.info("MQTT disconnected")
-        # Start background reconnect attempts
-        if self.client:
-            try:
-                try:
-                    self.client.reconnect_delay_set(min_delay=1, max_delay=30)
-                except Exception:
-                    pass
-                t = threading.Thread(target=self._attempt_reconnect_loop, daemon=True)
-                t.start()
-            except Exception as e:
-                logger.debug(f"Failed to start reconnect loop: {e}")
     
     def _on_message(self, client, userdata, msg):
-        """Callback for received MQTT messages."""
+        """Callback for received MQTT messages.
+        
+        Only malformed payloads are handled here; anything else (including
+        callback errors) propagates to the network loop, which logs it.
+        """
+        # Parse JSON payload; msg.payload may be bytes or a memoryview
+        payload = msg.payload
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received MQTT message: %s", bytes(payload))
         try:
-            # Decode message
-            payload = msg.payload.decode('utf-8')
-            logger.debug(f"Received MQTT message: {payload}")
-            
-            # Parse JSON payload
-            data = json.loads(payload)
-            
-            # Ignore status/heartbeat-only messages (no control state)
-            if 'state' not in data:
-                logger.debug("Ignoring MQTT payload without 'state' field")
+            decoded = _decode_playback(payload)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"Invalid JSON in MQTT message: {e}")
+            return
+        
+        # Ignore status/heartbeat-only messages (no control state)
+        if decoded is None:
+            logger.debug("Ignoring MQTT payload without 'state' field")
+            return
+        
+        state, media = decoded
+        
+        # Validate state
+        if not isinstance(state, str) or state not in _VALID_STATES:
+            logger.warning("Invalid state received: %s, defaulting to ambient", state)
+            state = 'ambient'
+        
+        # Update tracking (single atomic swap)
+        self._snapshot = (state, media, time.monotonic())
+        self._arm_timeout()
+        
+        logger.info("MQTT message: state=%s, media=%s", state, media)
+        
+        # Call message handler
+        if self.message_callback:
+            self.message_callback(state, media)
+
+    def _arm_timeout(self):
+        """(Re)start the message timeout timer while monitoring is active."""
+        with self._timer_lock:
+            if not self._timeout_active:
                 return
+            if self._timeout_timer:
+                self._timeout_timer.cancel()
+            self._timeout_timer = threading.Timer(self.timeout_seconds, self._fire_timeout)
+            self._timeout_timer.daemon = True
+            self._timeout_timer.start()
+    
+    def _cancel_timeout(self):
+        """Stop timeout monitoring."""
+        with self._timer_lock:
+            self._timeout_active = False
+            if self._timeout_timer:
+                self._timeout_timer.cancel()
+                self._timeout_timer = None
+        logger.debug("MQTT timeout monitoring stopped")
+    
+    def _fire_timeout(self):
+        """Trigger fallback to ambient after timeout_seconds without messages."""
+        try:
+            time_since_last_message = time.monotonic() - self.last_message_time
+            logger.warning(f"MQTT timeout: no messages for {time_since_last_message:.1f}s")
             
-            # Extract state and media (support 'animation' alias)
-            state = data.get('state')
-            media = data.get('media') or data.get('animation')
-            
-            # Validate state
-            if state not in ['active', 'ambient']:
-                logger.warning(f"Invalid state received: {state}, defaulting to ambient")
-                state = 'ambient'
-            
-            # Update tracking
-            self.current_state = state
-            self.current_media = media
-            self.last_message_time = time.time()
-            
-            logger.info(f"MQTT message: state={state}, media={media}")
-            
-            # Call message handler
+            # Trigger fallback to ambient
             if self.message_callback:
-                self.message_callback(state, media)
+                logger.info("Triggering fallback to ambient due to MQTT timeout")
+                self._snapshot = ('ambient', None, time.monotonic())
+                self.message_callback('ambient', None)
+            else:
+                # Reset timer to prevent repeated triggers
+                self.last_message_time = time.monotonic()
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in MQTT message: {e}")
         except Exception as e:
-            logger.error(f"Error processing MQTT message: {e}")
-
-    def _attempt_reconnect_loop(self):
-        """Attempt reconnect with exponential backoff until connected or client cleared."""
-        delay = 1
-        max_delay = 30
-        while self.client and not self.is_connected:
-            try:
-                logger.info("Attempting MQTT reconnect...")
-                self.client.reconnect()
-            except Exception as e:
-                logger.debug(f"Reconnect failed: {e}")
-            time.sleep(delay)
-            delay = min(max_delay, delay * 2)
-    
-    def _start_timeout_monitoring(self):
-        """Start thread to monitor MQTT message timeout."""
-        self.should_monitor_timeout = True
-        self.timeout_thread = threading.Thread(target=self._timeout_monitor_loop, daemon=True)
-        self.timeout_thread.start()
-        logger.debug("MQTT timeout monitoring started")
-    
-    def _stop_timeout_monitoring(self):
-        """Stop timeout monitoring thread."""
-        self.should_monitor_timeout = False
-        if self.timeout_thread and self.timeout_thread.is_alive():
-            self.timeout_thread.join(timeout=1.0)
-        logger.debug("MQTT timeout monitoring stopped")
-    
-    def _timeout_monitor_loop(self):
-        """Monitor for MQTT message timeout and trigger fallback."""
-        while self.should_monitor_timeout:
-            try:
-                current_time = time.time()
-                time_since_last_message = current_time - self.last_message_time
-                
-                # Check for timeout
-                if time_since_last_message > self.timeout_seconds:
-                    logger.warning(f"MQTT timeout: no messages for {time_since_last_message:.1f}s")
-                    
-                    # Trigger fallback to ambient
-                    if self.message_callback:
-                        logger.info("Triggering fallback to ambient due to MQTT timeout")
-                        self.current_state = 'ambient'
-                        self.current_media = None
-                        self.message_callback('ambient', None)
-                    
-                    # Reset timer to prevent repeated triggers
-                    self.last_message_time = current_time
-                
-                # Check every 5 seconds
-                time.sleep(5.0)
-                
-            except Exception as e:
-                logger.error(f"Error in timeout monitoring: {e}")
-                time.sleep(5.0)
+            logger.error(f"Error in timeout monitoring: {e}")
+        
+        finally:
+            self._arm_timeout()
     
     def get_connection_status(self) -> Dict[str, Any]:
         """Get current connection and message status."""
-        current_time = time.time()
-        time_since_last_message = current_time - self.last_message_time
+        state, media, last_message_time = self._snapshot
+        time_since_last_message = time.monotonic() - last_message_time
         
         return {
             "connected": self.is_connected,
-            "broker": f"{self.broker_host}:{self.broker_port}",
+            "broker": self._broker_addr,
             "topic": self.topic,
-            "current_state": self.current_state,
-            "current_media": self.current_media,
+            "current_state": state,
+            "current_media": media,
             "last_message_age": time_since_last_message,
             "timeout_threshold": self.timeout_seconds,
             "is_timeout": time_since_last_message > self.timeout_seconds
@@ -256,10 +420,178 @@ class MQTTHandler:
             return False
         
         try:
-            status_topic = f"{self.topic}/status"
-            payload = json.dumps(status_data)
-            self.client.publish(status_topic, payload)
-            logger.debug(f"Published status: {status_data}")
+            payload = _json_dumps(status_data)
+            self.client.publish(self._status_topic, payload)
+            logger.debug("Published status: %s", status_data)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to publish status: {e}")
+            return False
+
+class AsyncMQTTHandler(MQTTHandler):
+    """MQTTHandler whose networking runs on an asyncio event loop (uvloop when available).
+    
+    Requires aiomqtt. The loop lives on one background thread so the handler
+    stays a drop-in for the synchronous playback code; message handling,
+    status and callbacks are inherited from MQTTHandler.
+    """
+    
+    __slots__ = ('_loop', '_main_task', '_async_client')
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._main_task: Optional[asyncio.Task] = None
+        self._async_client = None
+    
+    def connect(self) -> bool:
+        """Start the event loop thread and wait for the first connection."""
+        if self.transport is not None:
+            # Loopback delivery is synchronous; there is no event loop to run
+            return super().connect()
+        if not HAS_AIOMQTT:
+            logger.error("aiomqtt not available, use MQTTHandler instead")
+            return False
+        
+        try:
+            logger.info(self._connect_log_msg)
+            self._loop = uvloop.new_event_loop() if HAS_UVLOOP else asyncio.new_event_loop()
+            # Created here rather than on the loop thread so a disconnect()
+            # straight after this returns always has a task to cancel
+            self._main_task = self._loop.create_task(self._run())
+            self._network_thread = threading.Thread(
+                target=self._run_loop,
+                name="mqtt-asyncio",
+                daemon=True
+            )
+            self._network_thread.start()
+            
+            connect_timeout = 10  # seconds
+            if self._connected_event.wait(timeout=connect_timeout):
+                logger.info("MQTT connection established")
+                return True
+            else:
+                logger.error("MQTT connection timeout (will keep retrying in background)")
+                return False
+                
+        except Exception as e:
+            logger.error(f"MQTT connection failed: {e}")
+            return False
+    
+    def disconnect(self):
+        """Cancel the network task and stop the event loop thread."""
+        if self.transport is not None:
+            return super().disconnect()
+        if self._loop and self._main_task:
+            logger.info("Disconnecting from MQTT broker")
+            self._loop.call_soon_threadsafe(self._main_task.cancel)
+        if self._network_thread and self._network_thread.is_alive():
+            self._network_thread.join(timeout=2.0)
+        self._network_thread = None
+        self._loop = None
+        self._main_task = None
+        
+        self.is_connected = False
+        self._connected_event.clear()
+    
+    def _run_loop(self):
+        """Thread target: drive _run until disconnect() cancels it."""
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+            logger.info("MQTT disconnected")
+    
+    async def _run(self):
+        """Connect, consume messages and reconnect with the same 1-30 s backoff as paho."""
+        delay = 1
+        protocol = aiomqtt.ProtocolVersion.V5 if self.use_mqtt5 else aiomqtt.ProtocolVersion.V311
+        # Started on the first connection, like the base class timer, and kept
+        # running across reconnects so the fallback also fires while offline
+        watchdog: Optional[asyncio.Task] = None
+        try:
+            while True:
+                try:
+                    async with aiomqtt.Client(
+                        self.broker_host,
+                        self.broker_port,
+                        identifier="halloween_projection_mapper",
+                        protocol=protocol,
+                        socket_options=SOCKET_OPTIONS
+                    ) as client:
+                        if self.use_mqtt5:
+                            await client.subscribe(self.topic, options=SubscribeOptions(
+                                qos=0, noLocal=True, retainAsPublished=False))
+                        else:
+                            await client.subscribe(self.topic, qos=0)
+                        
+                        logger.info(f"Connected to MQTT broker, subscribing to {self.topic}")
+                        self._async_client = client
+                        self.is_connected = True
+                        self._connected_event.set()
+                        self.last_message_time = time.monotonic()
+                        delay = 1
+                        if watchdog is None:
+                            watchdog = asyncio.ensure_future(self._watch_timeout())
+                        
+                        await self._consume(client)
+                        
+                except aiomqtt.MqttError as e:
+                    logger.warning(f"Unexpected MQTT disconnection ({e}), retrying in {delay}s")
+                finally:
+                    self._async_client = None
+                    self.is_connected = False
+                    self._connected_event.clear()
+                
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+                # Let it finish before _run_loop closes the loop
+                with contextlib.suppress(asyncio.CancelledError):
+                    await watchdog
+    
+    async def _consume(self, client):
+        """Dispatch messages until the connection drops."""
+        async for message in client.messages:
+            try:
+                self._on_message(client, None, message)
+            except Exception as e:
+                # Same contract as paho's suppress_exceptions: log and keep consuming
+                logger.error(f"Error processing MQTT message: {e}")
+    
+    async def _watch_timeout(self):
+        """Trigger the ambient fallback after timeout_seconds without a valid message.
+        
+        Independent of any broker session: it keeps counting while reconnecting.
+        """
+        while True:
+            # Only valid control messages refresh last_message_time
+            remaining = self.last_message_time + self.timeout_seconds - time.monotonic()
+            if remaining <= 0:
+                self._fire_timeout()
+                continue
+            await asyncio.sleep(remaining)
+    
+    def _arm_timeout(self):
+        """No timer needed; _watch_timeout sleeps until the current deadline."""
+    
+    def publish_status(self, status_data: Dict[str, Any]):
+        """Publish status back to MQTT (optional feature for debugging)."""
+        if self.transport is not None:
+            return super().publish_status(status_data)
+        client = self._async_client
+        if not self.is_connected or not client or not self._loop:
+            return False
+        
+        try:
+            payload = _json_dumps(status_data)
+            asyncio.run_coroutine_threadsafe(client.publish(self._status_topic, payload), self._loop)
+            logger.debug("Published status: %s", status_data)
             return True
         except Exception as e:
             logger.error(f"Failed to publish status: {e}")
@@ -268,22 +600,38 @@ class MQTTHandler:
 class MQTTSimulator:
     """Simulates controller MQTT messages for testing."""
     
+    __slots__ = (
+        'broker_host', 'broker_port', 'topic', 'client_id',
+        'client', 'is_connected', '_connected_event', '_network_thread', 'transport',
+    )
+    
     def __init__(self, 
                  broker_host: str = "localhost",
                  broker_port: int = 1883,
-                 topic: str = "halloween/playback"):
+                 topic: str = "halloween/playback",
+                 client_id: str = "halloween_controller_simulator",
+                 transport: Optional["LoopbackBridge"] = None):
         
         self.broker_host = broker_host
         self.broker_port = broker_port
         self.topic = topic
+        self.client_id = client_id
+        self.transport = transport
         self.client: Optional[mqtt.Client] = None
         self.is_connected = False
+        self._connected_event = threading.Event()
+        self._network_thread: Optional[threading.Thread] = None
     
     def connect(self) -> bool:
         """Connect simulator to MQTT broker."""
+        if self.transport is not None:
+            self.client = self.transport.client()
+            self._on_connect(self.client, None, {}, 0)
+            return True
+        
         try:
             self.client = mqtt.Client(
-                client_id="halloween_controller_simulator",
+                client_id=self.client_id,
                 protocol=mqtt.MQTTv311
             )
             
@@ -291,15 +639,20 @@ class MQTTSimulator:
             self.client.on_disconnect = self._on_disconnect
             
             logger.info(f"Simulator connecting to {self.broker_host}:{self.broker_port}")
-            self.client.connect(self.broker_host, self.broker_port, 60)
-            self.client.loop_start()
-            
-            # Wait for connection
-            start_time = time.time()
-            while not self.is_connected and (time.time() - start_time) < 5:
-                time.sleep(0.1)
+            self.client.connect_async(self.broker_host, self.broker_port, 60)
+            self._network_thread = threading.Thread(
+                target=self.client.loop_forever,
+                kwargs={'retry_first_connection': True},
+                name="mqtt-simulator",
+                daemon=True
+            )
+            self._network_thread.start()
             
-            return self.is_connected
+            # Wait for CONNACK (set by _on_connect)
+            if self._connected_event.wait(timeout=5):
+                return True
+            self.disconnect()
+            return False
             
         except Exception as e:
             logger.error(f"Simulator connection failed: {e}")
@@ -308,15 +661,19 @@ class MQTTSimulator:
     def disconnect(self):
         """Disconnect simulator."""
         if self.client:
-            self.client.loop_stop()
             self.client.disconnect()
+            if self._network_thread and self._network_thread.is_alive():
+                self._network_thread.join(timeout=2.0)
+            self._network_thread = None
             self.client = None
         self.is_connected = False
+        self._connected_event.clear()
     
     def _on_connect(self, client, userdata, flags, rc):
         """Simulator connection callback."""
         if rc == 0:
             self.is_connected = True
+            self._connected_event.set()
             logger.info("Controller simulator connected")
         else:
             logger.error(f"Simulator connection failed: {rc}")
@@ -324,6 +681,7 @@ class MQTTSimulator:
     def _on_disconnect(self, client, userdata, rc):
         """Simulator disconnection callback."""
         self.is_connected = False
+        self._connected_event.clear()
         logger.info("Controller simulator disconnected")
     
     def send_message(self, state: str, media: Optional[str] = None) -> bool:
@@ -338,9 +696,10 @@ class MQTTSimulator:
                 "media": media
             }
             
-            message = json.dumps(payload)
+            message = _json_dumps(payload)
             self.client.publish(self.topic, message)
-            logger.info(f"Simulator sent: {message}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Simulator sent: %s", message.decode('utf-8'))
             return True
             
         except Exception as e:
@@ -358,14 +717,76 @@ class MQTTSimulator:
         # Motion stops - back to ambient
         self.send_message("ambient", "ambient_01")
         logger.info("Motion simulation complete")
+    
+    async def simulate_motion_sequence_async(self, active_media: str = "active_01", hold: float = 3.0):
+        """Same sequence as simulate_motion_sequence without blocking the event loop.
+    
+        Several simulators (each with its own client_id) can be gathered on one
+        loop so their holds overlap instead of running back to back.
+        """
+        logger.info("Starting motion simulation sequence...")
+    
+        # publish() only queues the packet; the network thread sends it
+        self.send_message("active", active_media)
+        await asyncio.sleep(hold)
+    
+        self.send_message("ambient", "ambient_01")
+        logger.info("Motion simulation complete")
+
+class LoopbackBridge:
+    """In-process stand-in for the broker, for tests that don't need TCP.
+    
+    Pass one bridge as ``transport`` to an MQTTHandler and an MQTTSimulator:
+    publishes are delivered synchronously, in order, to every subscriber of
+    the exact topic, with the payload as a memoryview.
+    """
+    
+    __slots__ = ('_subscriptions',)
+    
+    def __init__(self):
+        self._subscriptions: List[Tuple[str, Callable]] = []
+    
+    def client(self, on_message: Optional[Callable] = None) -> "_LoopbackClient":
+        """Return a client bound to this bridge that delivers to on_message."""
+        return _LoopbackClient(self, on_message)
+    
+    def publish(self, topic: str, payload: bytes):
+        """Deliver payload to the subscribers of topic before returning."""
+        msg = SimpleNamespace(topic=topic, payload=memoryview(payload))
+        for subscribed_topic, on_message in tuple(self._subscriptions):
+            if subscribed_topic == topic:
+                on_message(None, None, msg)
+
+class _LoopbackClient:
+    """The part of paho's Client used by the handler and simulator, backed by a LoopbackBridge."""
+    
+    __slots__ = ('_bridge', '_on_message')
+    
+    def __init__(self, bridge: LoopbackBridge, on_message: Optional[Callable]):
+        self._bridge = bridge
+        self._on_message = on_message
+    
+    def subscribe(self, topic: str, qos: int = 0, options=None):
+        if self._on_message:
+            self._bridge._subscriptions.append((topic, self._on_message))
+    
+    def publish(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False):
+        self._bridge.publish(topic, payload)
+    
+    def disconnect(self):
+        self._bridge._subscriptions = [
+            sub for sub in self._bridge._subscriptions if sub[1] != self._on_message
+        ]
 
 # Test functions for Stage 3 verification
 def test_mqtt_handler():
     """Test MQTT handler functionality."""
     print("Testing MQTT Handler...")
     
-    # Test message parsing
-    handler = MQTTHandler(timeout_seconds=5)
+    # Handler and simulator talk through an in-process bridge (no broker)
+    bridge = LoopbackBridge()
+    handler = MQTTHandler(timeout_seconds=5, transport=bridge)
+    simulator = MQTTSimulator(transport=bridge)
     
     messages_received = []
     
@@ -373,16 +794,13 @@ def test_mqtt_handler():
         messages_received.append((state, media))
     
     handler.set_message_callback(test_callback)
+    assert handler.connect() and simulator.connect(), "Loopback connect should succeed"
     
-    # Simulate message processing
-    test_payload = json.dumps({"state": "active", "media": "active_01"})
-    
-    # Create mock message
-    class MockMessage:
-        def __init__(self, payload):
-            self.payload = payload
+    # Delivery is synchronous, so the callback has run once send_message returns
+    simulator.send_message("active", "active_01")
     
-    handler._on_message(None, None, MockMessage(test_payload.encode()))
+    handler.disconnect()
+    simulator.disconnect()
     
     # Verify callback was called
     assert len(messages_received) == 1, "Should receive one message"
@@ -0,0 +1,18 @@
+"""
+Socket tuning for Halloween Projection Mapper's MQTT connections.
+Shared by the MQTT handler and the WLED bridge tool; stdlib only.
+"""
+import socket
+
+# Send small control packets (ping, subscribe, status, playback) immediately
+# instead of letting Nagle hold them back waiting for an ACK
+SOCKET_OPTIONS = ((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),)
+
+def tune_socket(client, userdata, sock):
+    """paho on_socket_open callback applying SOCKET_OPTIONS to plain TCP sockets.
+    
+    Websocket wrappers and unix-domain sockets have no TCP options to set.
+    """
+    if isinstance(sock, socket.socket) and sock.family in (socket.AF_INET, socket.AF_INET6):
+        for option in SOCKET_OPTIONS:
+            sock.setsockopt(*option)
@@ -0,0 +1,22 @@
+"""
+Raspberry Pi board detection for Halloween Projection Mapper.
+Shared by the video engine and the encoding tool; stdlib only.
+"""
+import re
+from typing import Optional
+
+def detect_pi_generation() -> Optional[int]:
+    """Return the Raspberry Pi board generation (0 for Zero boards), or None off-Pi."""
+    try:
+        with open('/proc/device-tree/model') as f:
+            model = f.read().rstrip('\x00')
+    except OSError:
+        return None
+
+    if 'Raspberry Pi' not in model:
+        return None
+    if 'Zero' in model:
+        return 0
+    # "Raspberry Pi 4 Model B", "Raspberry Pi Compute Module 3+", "Raspberry Pi 400"
+    match = re.search(r'Raspberry Pi (?:Compute Module )?(\d)', model)
+    return int(match.group(1)) if match else 1
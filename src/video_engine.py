@@ -3,17 +3,20 @@ Video playback engine for Halloween Projection Mapper.
 Handles H.264 hardware-accelerated playback, preloading, and 6-strip processing.
 """
 import os
+import queue
 import threading
 import time
 import logging
 import random
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional, Tuple, List, Any
 import cv2
 import numpy as np
 from mask_manager import MaskManager
-from mqtt_handler import MQTTHandler
+from mqtt_handler import MQTTHandler, AsyncMQTTHandler, HAS_AIOMQTT
 from config_manager import ConfigManager, CrossfadeManager, ParameterAdjustmentUI
 from error_handler import ErrorHandler, ErrorSeverity, handle_error
+from pi_platform import detect_pi_generation
 
 # Handle ffpyplayer import for Pi vs development
 try:
@@ -27,6 +30,62 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PI_GENERATION = detect_pi_generation()
+
+# ffpyplayer only reports a bad vcodec after the player has started, so the
+# decoder is chosen per board instead of by trial. MMAL is legacy-only (Pi 0-3),
+# the Pi 4 decodes H.264 via V4L2 M2M, and the Pi 5 has no H.264 block at all.
+if PI_GENERATION == 4:
+    H264_DECODERS: Tuple[Optional[str], ...] = ('h264_v4l2m2m', None)
+elif PI_GENERATION is not None and PI_GENERATION < 4:
+    H264_DECODERS = ('h264_mmal', 'h264_v4l2m2m', None)
+else:
+    H264_DECODERS = (None,)
+
+# pollKey (OpenCV 4.5+) pumps GUI events without waitKey(1)'s minimum 1 ms sleep
+if hasattr(cv2, 'pollKey'):
+    _poll_key = cv2.pollKey
+else:
+    def _poll_key() -> int:
+        return cv2.waitKey(1)
+
+# Presenter thread scheduling: the last core of a 4-core Pi sees the least
+# system load; SCHED_FIFO keeps frame deadlines ahead of ordinary processes
+PRESENTER_CORE = 3
+PRESENTER_RT_PRIORITY = 20
+
+def _raise_thread_priority(core: int = PRESENTER_CORE, rt_priority: int = PRESENTER_RT_PRIORITY):
+    """Pin the calling thread to core and give it real-time priority where permitted.
+    
+    Threads started afterwards inherit both the CPU mask and the policy, so
+    only call this from a thread that never starts others, directly or via
+    anything it calls: not the playback loop (decoders, OpenCV workers), and
+    not key handling (reload and fallback start loaders and players).
+    Falls back to nice(-10) without CAP_SYS_NICE; on platforms without the
+    Linux scheduler APIs this does nothing.
+    """
+    if hasattr(os, 'sched_setaffinity') and core < (os.cpu_count() or 1):
+        try:
+            os.sched_setaffinity(0, {core})
+        except OSError as e:
+            logger.debug(f"Could not pin presenter thread to core {core}: {e}")
+    
+    if hasattr(os, 'sched_setscheduler'):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(rt_priority))
+            return
+        except OSError as e:
+            logger.debug(f"SCHED_FIFO unavailable for presenter thread: {e}")
+    
+    try:
+        os.nice(-10)
+    except (OSError, AttributeError) as e:
+        logger.debug(f"Could not raise presenter thread priority: {e}")
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+# Metadata probes run concurrently; a handful of workers saturates SD-card I/O on a Pi
+PRELOAD_WORKERS = 4
+
 class VideoStrip:
     """Represents one horizontal strip of a video for stair projection."""
     def __init__(self, strip_index: int, frame_height: int, frame_width: int):
@@ -66,40 +125,50 @@ class PreloadedVideo:
                 
         except Exception as e:
             logger.error(f"Failed to load metadata for {self.filepath}: {e}")
+            return
+        
+        self._warm_page_cache()
+    
+    def _warm_page_cache(self):
+        """Ask the kernel to read the file into the page cache ahead of playback."""
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        try:
+            fd = os.open(self.filepath, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.debug(f"posix_fadvise failed for {self.filepath}: {e}")
     
     def _load_metadata_ffpyplayer(self):
         """Load metadata using ffpyplayer."""
-        # Create temporary player to get metadata (prefer v4l2m2m, fallback to mmal)
-        temp_player = None
-        for vcodec in ('h264_v4l2m2m', 'h264_mmal', None):
-            try:
-                ff_opts = {'an': True}
-                if vcodec:
-                    ff_opts['vcodec'] = vcodec
-                temp_player = MediaPlayer(self.filepath, ff_opts=ff_opts)
-                break
-            except Exception:
-                temp_player = None
-                continue
+        temp_player = self._open_ffpyplayer()
         if temp_player is None:
             raise RuntimeError("Failed to initialize ffpyplayer for metadata")
         
-        # Get first frame to determine dimensions
-        frame, val = temp_player.get_frame()
-        if frame is not None:
-            img, t = frame
-            self.frame_width = img.get_size()[0]
-            self.frame_height = img.get_size()[1]
+        try:
+            # Metadata is filled in asynchronously; wait for the first decoded frame
+            deadline = time.monotonic() + 5.0
+            frame = None
+            while frame is None and time.monotonic() < deadline:
+                frame, val = temp_player.get_frame()
+                if frame is None:
+                    time.sleep(0.01)
+            if frame is not None:
+                img, t = frame
+                self.frame_width, self.frame_height = img.get_size()
             
-        # Get duration and fps
-        metadata = temp_player.get_metadata()
-        self.duration = metadata.get('duration', 0.0)
-        self.fps = metadata.get('frame_rate', 30.0)
-        
-        temp_player.close_player()
+            # Get duration and fps (frame_rate is a (num, den) tuple)
+            metadata = temp_player.get_metadata()
+            self.duration = metadata.get('duration') or 0.0
+            num, den = metadata.get('frame_rate') or (0, 0)
+            self.fps = num / den if num and den else 30.0
+        finally:
+            temp_player.close_player()
         
-        # Create strips
-        self.strips = [VideoStrip(i, self.frame_height, self.frame_width) for i in range(6)]
+        self._build_strip_table()
         self.is_loaded = True
         
         logger.info(f"Loaded metadata (ffpyplayer) for {os.path.basename(self.filepath)}: "
@@ -120,26 +189,42 @@ class PreloadedVideo:
         
         cap.release()
         
-        # Create strips
-        self.strips = [VideoStrip(i, self.frame_height, self.frame_width) for i in range(6)]
+        self._build_strip_table()
         self.is_loaded = True
         
         logger.info(f"Loaded metadata (OpenCV) for {os.path.basename(self.filepath)}: "
                    f"{self.frame_width}x{self.frame_height}, {self.fps}fps, {self.duration:.1f}s")
             
-    def create_player(self):
+    def _build_strip_table(self):
+        """Build the 6 stair strips once per video."""
+        self.strips = [VideoStrip(i, self.frame_height, self.frame_width) for i in range(6)]
+    
+    def _open_ffpyplayer(self, loop: bool = False) -> Optional[MediaPlayer]:
+        """Open an ffpyplayer instance using the board's preferred H.264 decoder.
+        
+        With loop=True the demuxer restarts the stream itself (ffmpeg's
+        -loop 0), so playback never reaches EOF and the player is not rebuilt.
+        """
+        for vcodec in H264_DECODERS:
+            try:
+                # Decode straight to planar YUV; one cvtColor pass gives BGR
+                ff_opts = {'an': True, 'out_fmt': 'yuv420p'}
+                if loop:
+                    ff_opts['loop'] = 0
+                if vcodec:
+                    ff_opts['vcodec'] = vcodec
+                return MediaPlayer(self.filepath, ff_opts=ff_opts)
+            except Exception as e:
+                logger.debug(f"ffpyplayer init failed with {vcodec}: {e}")
+                continue
+        return None
+    
+    def create_player(self, loop: bool = False):
         """Create a new player instance (ffpyplayer or OpenCV)."""
         if HAS_FFPYPLAYER:
-            # Try modern Pi decoder first, fallback to mmal
-            for vcodec in ('h264_v4l2m2m', 'h264_mmal', None):
-                try:
-                    ff_opts = {'an': True}
-                    if vcodec:
-                        ff_opts['vcodec'] = vcodec
-                    return MediaPlayer(self.filepath, ff_opts=ff_opts)
-                except Exception as e:
-                    logger.debug(f"ffpyplayer init failed with {vcodec}: {e}")
-                    continue
+            player = self._open_ffpyplayer(loop=loop)
+            if player is not None:
+                return player
             logger.warning("ffpyplayer unavailable for playback; falling back to OpenCV")
         # OpenCV fallback
         return cv2.VideoCapture(self.filepath)
@@ -160,7 +245,15 @@ class VideoEngine:
         # State management
         self.current_state = "ambient"
         self.fallback_ambient_video = None
+        # Crossfade snapshot: written to the back buffer, then published as
+        # last_frame; readers copy it under _last_frame_lock
         self.last_frame: Optional[np.ndarray] = None
+        self._last_frame_bufs: List[Optional[np.ndarray]] = [None, None]
+        self._last_frame_slot = 0
+        self._last_frame_lock = threading.Lock()
+        # Packed I420 staging buffer (ffpyplayer) and the reused BGR decode buffer
+        self._yuv_buf: Optional[np.ndarray] = None
+        self._bgr_buf: Optional[np.ndarray] = None
         self.headless = headless
         
         # Error handling and monitoring
@@ -175,9 +268,10 @@ class VideoEngine:
         # Mask management
         self.mask_manager = MaskManager()
         
-        # MQTT communication with configurable timeout
+        # MQTT communication with configurable timeout (asyncio client when aiomqtt is installed)
         timeout_seconds = self.config_manager.get_mqtt_timeout_seconds()
-        self.mqtt_handler = MQTTHandler(
+        handler_class = AsyncMQTTHandler if HAS_AIOMQTT else MQTTHandler
+        self.mqtt_handler = handler_class(
             broker_host=mqtt_broker, 
             broker_port=mqtt_port,
             timeout_seconds=timeout_seconds
@@ -186,74 +280,112 @@ class VideoEngine:
         
         # Display window
         self.window_name = "Halloween Projection"
+        # Two-slot single-producer/single-consumer ring between the playback
+        # thread (writes head) and the presenter thread (writes tail)
+        self._present_ring: List[Optional[np.ndarray]] = [None, None]
+        self._present_head = 0
+        self._present_tail = 0
+        self._present_event = threading.Event()
+        self._presenting = False
+        self._presenter_thread: Optional[threading.Thread] = None
+        # Keys polled by the (real-time) presenter are handled on a normal
+        # thread, since handlers may start loaders and playback threads
+        self._key_queue: "queue.SimpleQueue[Optional[int]]" = queue.SimpleQueue()
+        self._key_thread: Optional[threading.Thread] = None
         if not self.headless:
             cv2.namedWindow(self.window_name, cv2.WINDOW_FULLSCREEN)
             
             # Set mouse callback for mask editing
             cv2.setMouseCallback(self.window_name, self.mask_manager.handle_mouse_event)
+            
+            self._presenting = True
+            self._key_thread = threading.Thread(target=self._key_loop, name="key-handler", daemon=True)
+            self._key_thread.start()
+            self._presenter_thread = threading.Thread(target=self._presenter_loop, daemon=True)
+            self._presenter_thread.start()
         
         # Exit signaling for outer app loop
         self.exit_requested = False
         self.idle_message: Optional[str] = None
         self._local_media_indices = {"active": 0, "ambient": 0}
+        # Per-state media lookups rebuilt whenever the library changes (see _index_media)
+        self._media_by_category: Dict[str, List[str]] = {"active": [], "ambient": []}
+        self._media_aliases: Dict[str, Dict[str, str]] = {"active": {}, "ambient": {}}
+        # Debounced state change waiting for the buffer window to pass
+        self._pending_state_change: Optional[Tuple[str, Optional[str]]] = None
+        self._debounce_timer: Optional[threading.Timer] = None
+        self._debounce_lock = threading.Lock()
         
     def scan_media_folder(self, media_path: str) -> List[str]:
         """Scan media folder for MP4 files."""
-        video_files = []
-        if os.path.exists(media_path):
-            for file in os.listdir(media_path):
-                if file.lower().endswith(('.mp4', '.avi', '.mov')):
-                    video_files.append(os.path.join(media_path, file))
-        return video_files
+        if not os.path.isdir(media_path):
+            return []
+        # scandir entries carry the file type from the directory read, so no extra stat per file
+        with os.scandir(media_path) as entries:
+            return [entry.path for entry in entries
+                    if entry.is_file() and entry.name.lower().endswith(VIDEO_EXTENSIONS)]
     
     def preload_videos(self, media_folders: List[str]):
         """Preload video metadata from specified folders."""
         logger.info("Starting video preloading...")
+        self.add_preloaded_videos(self._load_library(media_folders))
+    
+    def add_preloaded_videos(self, videos: Dict[str, PreloadedVideo]):
+        """Register already-loaded videos and rebuild the media lookups.
         
-        for folder in media_folders:
-            video_files = self.scan_media_folder(folder)
-            for video_path in video_files:
-                video_id = os.path.splitext(os.path.basename(video_path))[0]
-                category = self._infer_category_from_path(video_path)
-
-                preloaded = PreloadedVideo(video_path, category=category)
-                preloaded.load_metadata()
-                
-                if preloaded.is_loaded:
-                    self.preloaded_videos[video_id] = preloaded
-                    logger.info(f"Preloaded: {video_id}")
+        PreloadedVideo holds only metadata once loaded, so one library can be
+        shared by several engines.
+        """
+        for video_id, preloaded in videos.items():
+            self.preloaded_videos[video_id] = preloaded
+            logger.info(f"Preloaded: {video_id}")
         
         logger.info(f"Preloading complete. {len(self.preloaded_videos)} videos ready.")
         
         # Set fallback ambient video
+        self._index_media()
         self._set_fallback_ambient_video()
         self._reset_local_media_indices()
+        self._prepare_masks()
 
     def reload_media(self, media_folders: List[str] = None):
         """Reload media library from disk and update preloaded videos."""
         media_folders = media_folders or ['media/active', 'media/ambient']
         logger.info("Reloading media library...")
         current = self.current_video
-        new_preloaded: Dict[str, PreloadedVideo] = {}
-        for folder in media_folders:
-            video_files = self.scan_media_folder(folder)
-            for video_path in video_files:
-                video_id = os.path.splitext(os.path.basename(video_path))[0]
-                category = self._infer_category_from_path(video_path)
-                pre = PreloadedVideo(video_path, category=category)
-                pre.load_metadata()
-                if pre.is_loaded:
-                    new_preloaded[video_id] = pre
+        new_preloaded = self._load_library(media_folders)
         with self.playback_lock:
             self.preloaded_videos = new_preloaded
+            self._index_media()
             self._set_fallback_ambient_video()
             self._reset_local_media_indices()
+            self._prepare_masks()
             if current and current in self.preloaded_videos:
                 logger.info(f"Current video still available: {current}")
             else:
                 logger.info("Current video no longer available; falling back to ambient")
                 self._fallback_to_ambient()
     
+    def _load_library(self, media_folders: List[str]) -> Dict[str, PreloadedVideo]:
+        """Load metadata for every video in media_folders, probing files in parallel.
+        
+        Probing is dominated by file and codec opens, which release the GIL.
+        Results are collected in scan order, so later duplicates of an ID
+        still win as with a serial scan.
+        """
+        videos = []
+        for folder in media_folders:
+            for video_path in self.scan_media_folder(folder):
+                video_id = os.path.splitext(os.path.basename(video_path))[0]
+                videos.append((video_id, PreloadedVideo(video_path, category=self._infer_category_from_path(video_path))))
+        
+        if videos:
+            with ThreadPoolExecutor(max_workers=min(PRELOAD_WORKERS, len(videos)),
+                                    thread_name_prefix="preload") as pool:
+                list(pool.map(lambda item: item[1].load_metadata(), videos))
+        
+        return {video_id: preloaded for video_id, preloaded in videos if preloaded.is_loaded}
+    
     def get_available_videos(self) -> List[str]:
         """Get list of available video IDs."""
         return list(self.preloaded_videos.keys())
@@ -278,12 +410,31 @@ class VideoEngine:
             matches = [vid_id for vid_id in self.preloaded_videos.keys() if vid_id.startswith(prefix)]
         return sorted(matches)
 
+    def _index_media(self):
+        """Precompute the per-state lookups used when resolving MQTT messages.
+        
+        _media_aliases maps each accepted media name to a video ID: the ID
+        itself, plus the name without its state prefix (e.g. "scare" for
+        "active_scare"). Exact IDs take precedence over stripped names.
+        """
+        for state in ("active", "ambient"):
+            self._media_by_category[state] = self._collect_media_ids_by_category(state)
+            
+            prefix = f"{state}_"
+            aliases = {}
+            for vid_id in self.preloaded_videos:
+                stripped = vid_id[len(prefix):]
+                if vid_id.startswith(prefix) and not stripped.startswith(prefix):
+                    aliases[stripped] = vid_id
+            aliases.update((vid_id, vid_id) for vid_id in self.preloaded_videos)
+            self._media_aliases[state] = aliases
+
     def _pick_local_media(self, state: str) -> Optional[str]:
         """Select a local media ID based on configured strategy."""
         if not self.config_manager.is_local_media_selection_enabled():
             return None
 
-        pool = self._collect_media_ids_by_category(state)
+        pool = self._media_by_category.get(state)
         if not pool:
             return None
 
@@ -315,25 +466,52 @@ class VideoEngine:
                 self.fallback_ambient_video = available[0]
                 logger.warning(f"No ambient videos found, using fallback: {self.fallback_ambient_video}")
     
+    def _prepare_masks(self):
+        """Build mask remap tables for the fallback video's size before playback starts."""
+        preloaded = self.preloaded_videos.get(self.fallback_ambient_video)
+        if preloaded:
+            self.mask_manager.prepare(preloaded.frame_height, preloaded.frame_width)
+    
     def _handle_mqtt_message(self, state: str, media: Optional[str]):
         """Handle incoming MQTT state/media messages from the controller."""
         logger.info(f"MQTT message received: state={state}, media={media}")
         
         self.current_state = state
         
-        # Apply state change buffer delay
+        # Apply state change buffer: the latest message wins once it has been
+        # quiet for buffer_ms; the MQTT thread is never blocked
         buffer_ms = self.config_manager.get_state_change_buffer_ms()
-        if buffer_ms > 0:
-            logger.debug(f"Applying state change buffer: {buffer_ms}ms")
-            time.sleep(buffer_ms / 1000.0)
+        if buffer_ms <= 0:
+            self._apply_state_change(state, media)
+            return
         
+        logger.debug(f"Applying state change buffer: {buffer_ms}ms")
+        with self._debounce_lock:
+            self._pending_state_change = (state, media)
+            if self._debounce_timer is not None:
+                self._debounce_timer.cancel()
+            self._debounce_timer = threading.Timer(buffer_ms / 1000.0, self._apply_pending_state_change)
+            self._debounce_timer.daemon = True
+            self._debounce_timer.start()
+    
+    def _apply_pending_state_change(self):
+        """Apply the most recent buffered state change (debounce timer callback)."""
+        with self._debounce_lock:
+            pending = self._pending_state_change
+            self._pending_state_change = None
+            self._debounce_timer = None
+        if pending:
+            self._apply_state_change(*pending)
+    
+    def _apply_state_change(self, state: str, media: Optional[str]):
+        """Switch playback for a state/media change once any buffering is done."""
         # Determine target video
         target_video = self._resolve_target_video(state, media)
         
         if target_video:
             # Start crossfade if enabled and we have a current frame
-            if self.last_frame is not None and self.config_manager.get_crossfade_duration_ms() > 0:
-                self.crossfade_manager.start_crossfade(self.last_frame.copy())
+            if self.config_manager.get_crossfade_duration_ms() > 0:
+                self._crossfade_from_last_frame()
             
             # Measure response time
             start_time = time.time()
@@ -353,15 +531,10 @@ class VideoEngine:
         """Resolve the target video based on state and media ID."""
         if state == "active":
             if media:
-                # Try exact media match first
-                if media in self.preloaded_videos:
-                    return media
-
-                # Try with active prefix if not already present
-                if not media.startswith('active_'):
-                    prefixed_media = f"active_{media}"
-                    if prefixed_media in self.preloaded_videos:
-                        return prefixed_media
+                # Exact ID first, then the active_-prefixed ID (one dict lookup)
+                target = self._media_aliases["active"].get(media)
+                if target:
+                    return target
 
                 logger.warning(f"Requested media '{media}' not found")
 
@@ -372,15 +545,11 @@ class VideoEngine:
             return None
 
         if state == "ambient":
-            # For ambient state, prefer specified media or use fallback
-            if media and media in self.preloaded_videos:
-                return media
-
-            # Try with ambient prefix
-            if media and not media.startswith('ambient_'):
-                prefixed_media = f"ambient_{media}"
-                if prefixed_media in self.preloaded_videos:
-                    return prefixed_media
+            # For ambient state, prefer specified media (exact or ambient_-prefixed) or use fallback
+            if media:
+                target = self._media_aliases["ambient"].get(media)
+                if target:
+                    return target
 
             local_choice = self._pick_local_media('ambient')
             if local_choice:
@@ -495,7 +664,7 @@ class VideoEngine:
             try:
                 # Create new player instance
                 preloaded = self.preloaded_videos[self.current_video]
-                self.current_player = preloaded.create_player()
+                self.current_player = preloaded.create_player(loop=self.should_loop)
                 
                 frame_time = 1.0 / preloaded.fps
                 
@@ -518,12 +687,33 @@ class VideoEngine:
                 )
                 self.is_playing = False
     
+    def _pace_frame(self, deadline: float, frame_time: float) -> Tuple[float, int]:
+        """Sleep until deadline, the scheduled end of the frame just shown.
+        
+        Pacing against absolute monotonic deadlines keeps decode/display time
+        from stretching the frame period. When the loop has fallen behind,
+        whole missed frame slots are skipped instead of sleeping.
+        
+        Returns:
+            (deadline to use for the frame just shown, number of frames to drop)
+        """
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            return deadline, 0
+        
+        missed = int(-delay // frame_time)
+        return deadline + missed * frame_time, missed
+    
     def _playback_loop_ffpyplayer(self, preloaded: PreloadedVideo, frame_time: float):
         """Playback loop using ffpyplayer."""
+        next_deadline = time.monotonic()
         while self.is_playing:
             frame, val = self.current_player.get_frame()
             
             if val == 'eof':
+                # Looping players restart inside the demuxer and normally never
+                # report EOF; rebuilding the player is only a fallback
                 if self.should_loop:
                     logger.debug(f"Looping video: {self.current_video}")
                     break  # Break inner loop to restart video
@@ -534,22 +724,47 @@ class VideoEngine:
             if frame is not None:
                 img, t = frame
                 
-                # Convert to OpenCV format
-                w, h = img.get_size()
-                frame_array = np.frombuffer(img.to_bytearray()[0], dtype=np.uint8)
-                frame_array = frame_array.reshape((h, w, 3))
-                frame_bgr = cv2.cvtColor(frame_array, cv2.COLOR_RGB2BGR)
-                
                 # Process strips (basic display for now)
-                self._display_strips(frame_bgr, preloaded.strips)
+                self._display_strips(self._yuv420p_to_bgr(img), preloaded.strips)
             
-            # Frame timing
-            time.sleep(frame_time)
+            # Frame timing (ffpyplayer drops late frames itself, so just re-sync)
+            next_deadline, _ = self._pace_frame(next_deadline + frame_time, frame_time)
+    
+    def _yuv420p_to_bgr(self, img) -> np.ndarray:
+        """Convert a yuv420p ffpyplayer image to BGR in one cvtColor pass.
+        
+        The Y/U/V planes are read through zero-copy memoryviews and packed
+        into a reused I420 buffer (half the bytes of RGB) before conversion.
+        """
+        w, h = img.get_size()
+        if self._yuv_buf is None or self._yuv_buf.shape != (h * 3 // 2, w):
+            self._yuv_buf = np.empty((h * 3 // 2, w), dtype=np.uint8)
+        
+        packed = self._yuv_buf.reshape(-1)
+        offset = 0
+        plane_sizes = ((w, h), (w // 2, h // 2), (w // 2, h // 2))
+        for plane, linesize, (plane_w, plane_h) in zip(img.to_memoryview(), img.get_linesizes(), plane_sizes):
+            # Rows may be padded past the visible width; copy only the visible part
+            rows = np.frombuffer(plane, dtype=np.uint8)[:plane_h * linesize].reshape(plane_h, linesize)
+            end = offset + plane_w * plane_h
+            np.copyto(packed[offset:end].reshape(plane_h, plane_w), rows[:, :plane_w])
+            offset = end
+        
+        return cv2.cvtColor(self._yuv_buf, cv2.COLOR_YUV2BGR_I420, dst=self._bgr_buffer(h, w))
+    
+    def _bgr_buffer(self, height: int, width: int) -> np.ndarray:
+        """Return the reused BGR decode buffer, reallocating only on a size change."""
+        if self._bgr_buf is None or self._bgr_buf.shape != (height, width, 3):
+            self._bgr_buf = np.empty((height, width, 3), dtype=np.uint8)
+        return self._bgr_buf
     
     def _playback_loop_opencv(self, preloaded: PreloadedVideo, frame_time: float):
         """Playback loop using OpenCV."""
+        next_deadline = time.monotonic()
+        frame_buf = self._bgr_buffer(preloaded.frame_height, preloaded.frame_width)
         while self.is_playing:
-            ret, frame = self.current_player.read()
+            # Decode into the same buffer every frame instead of a fresh array
+            ret, frame = self.current_player.read(frame_buf)
             
             if not ret:
                 if self.should_loop:
@@ -564,8 +779,10 @@ class VideoEngine:
             # Process strips (basic display for now)
             self._display_strips(frame, preloaded.strips)
             
-            # Frame timing
-            time.sleep(frame_time)
+            # Frame timing; when behind, skip decoding the frames we missed
+            next_deadline, dropped = self._pace_frame(next_deadline + frame_time, frame_time)
+            for _ in range(dropped):
+                self.current_player.grab()
     
     def _cleanup_current_player(self):
         """Clean up current player regardless of type."""
@@ -581,13 +798,26 @@ class VideoEngine:
         self._render_frame(frame, apply_masks=True)
 
     def _render_frame(self, frame: np.ndarray, *, apply_masks: bool):
-        """Render a single frame with overlays and optional masking."""
-        # Store current frame for potential crossfade
-        self.last_frame = frame.copy()
+        """Render a single frame with overlays and optional masking.
+
+        The frame is handed over to the renderer: overlays may be drawn on it
+        directly when no masking or crossfade produces a separate buffer.
+        """
+        # Keep a snapshot for crossfades, only while crossfades are enabled
+        if self.config_manager.get_crossfade_duration_ms() > 0:
+            self._store_last_frame(frame)
+
+        # Steady playback (no fade, editor or parameter UI): mask and present only
+        if not (self.crossfade_manager.is_crossfading or self.mask_manager.is_editing
+                or self.parameter_ui.show_ui):
+            display_frame = self.mask_manager.apply_masks_to_frame(frame) if apply_masks else frame
+            if not self.headless:
+                self._submit_for_present(display_frame)
+            return
 
-        display_frame = frame.copy()
+        display_frame = frame
 
-        # Apply crossfade if active
+        # Apply crossfade if active (blends into the manager's reused buffer)
         if self.crossfade_manager.is_active():
             display_frame = self.crossfade_manager.update_crossfade(display_frame)
 
@@ -606,17 +836,86 @@ class VideoEngine:
         if self.headless:
             return
 
-        cv2.imshow(self.window_name, display_frame)
-
-        # Handle keyboard input
-        key = cv2.waitKey(1) & 0xFF
-        if key != 255:  # Key was pressed
-            # Try parameter UI first
-            if not self.parameter_ui.handle_keyboard_input(key):
-                # Then mask manager
-                if not self.mask_manager.handle_keyboard_event(key):
-                    # Handle application-level keys
-                    self._handle_application_keys(key)
+        self._submit_for_present(display_frame)
+    
+    def _submit_for_present(self, frame: np.ndarray):
+        """Copy frame into the next free ring slot for the presenter thread.
+        
+        If both slots are still waiting to be shown the frame is dropped
+        rather than blocking decode on the display.
+        """
+        head = self._present_head
+        if head - self._present_tail >= len(self._present_ring):
+            return
+        
+        index = head % len(self._present_ring)
+        slot = self._present_ring[index]
+        if slot is None or slot.shape != frame.shape:
+            slot = self._present_ring[index] = np.empty_like(frame)
+        np.copyto(slot, frame)
+        
+        # Publish only after the slot is fully written
+        self._present_head = head + 1
+        self._present_event.set()
+    
+    def _presenter_loop(self):
+        """Show frames from the present ring and pump GUI/keyboard events."""
+        _raise_thread_priority()
+        while self._presenting:
+            self._present_event.clear()
+            tail = self._present_tail
+            if tail == self._present_head:
+                # Nothing new; still pump GUI events now and then while idle
+                if self._present_event.wait(0.03):
+                    continue
+            else:
+                cv2.imshow(self.window_name, self._present_ring[tail % len(self._present_ring)])
+                self._present_tail = tail + 1
+            
+            # Hand keyboard input to the key thread
+            key = _poll_key() & 0xFF
+            if key != 255:  # Key was pressed
+                self._key_queue.put(key)
+    
+    def _key_loop(self):
+        """Dispatch keys polled by the presenter, in order, at normal priority."""
+        while True:
+            key = self._key_queue.get()
+            if key is None:
+                return
+            try:
+                # Try parameter UI first
+                if not self.parameter_ui.handle_keyboard_input(key):
+                    # Then mask manager
+                    if not self.mask_manager.handle_keyboard_event(key):
+                        # Handle application-level keys
+                        self._handle_application_keys(key)
+            except Exception as e:
+                logger.error(f"Error handling key {key}: {e}")
+    
+    def _store_last_frame(self, frame: np.ndarray):
+        """Copy frame into the back snapshot buffer, then publish it as last_frame.
+        
+        Readers hold _last_frame_lock while copying the published buffer, so
+        the back buffer written here is never one being read.
+        """
+        slot = self._last_frame_slot ^ 1
+        buf = self._last_frame_bufs[slot]
+        if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+            buf = self._last_frame_bufs[slot] = np.empty_like(frame)
+        np.copyto(buf, frame)
+        with self._last_frame_lock:
+            self._last_frame_slot = slot
+            self.last_frame = buf
+    
+    def _crossfade_from_last_frame(self) -> bool:
+        """Start a crossfade from the last displayed frame, if there is one."""
+        with self._last_frame_lock:
+            if self.last_frame is None:
+                return False
+            # start_crossfade copies the frame before the lock is released
+            self.crossfade_manager.start_crossfade(self.last_frame)
+        return True
     
     def _draw_crossfade_indicator(self, image: np.ndarray):
         """Draw crossfade progress indicator."""
@@ -660,8 +959,7 @@ class VideoEngine:
             self.parameter_ui.toggle_ui()
         elif key_char == 'c':
             # Test crossfade
-            if self.last_frame is not None:
-                self.crossfade_manager.start_crossfade(self.last_frame.copy())
+            if self._crossfade_from_last_frame():
                 logger.info("Manual crossfade triggered")
         elif key_char == 'i':
             # Show system info
@@ -690,8 +988,23 @@ class VideoEngine:
     def cleanup(self):
         """Clean up resources."""
         try:
+            with self._debounce_lock:
+                if self._debounce_timer is not None:
+                    self._debounce_timer.cancel()
+                self._debounce_timer = None
+                self._pending_state_change = None
+            
             self.stop_playback()
             self.disconnect_mqtt()
+            self.mask_manager.shutdown()
+            
+            self._presenting = False
+            self._present_event.set()
+            if self._presenter_thread and self._presenter_thread.is_alive():
+                self._presenter_thread.join(timeout=1.0)
+            self._key_queue.put(None)
+            if self._key_thread and self._key_thread.is_alive() and self._key_thread is not threading.current_thread():
+                self._key_thread.join(timeout=1.0)
             
             # Stop error monitoring
             if hasattr(self, 'error_handler'):
@@ -722,11 +1035,12 @@ class VideoEngine:
     def _idle_loop(self):
         """Display loop for idle state messaging."""
         frame_time = 1.0 / 30.0
+        next_deadline = time.monotonic()
 
         while self.is_playing and self.current_video == "_idle":
             frame = self._build_idle_frame()
             self._render_frame(frame, apply_masks=False)
-            time.sleep(frame_time)
+            next_deadline, _ = self._pace_frame(next_deadline + frame_time, frame_time)
 
     def _build_idle_frame(self) -> np.ndarray:
         """Create a frame instructing the user to add media files."""
@@ -0,0 +1,42 @@
+"""
+Shared helpers for the stage tests.
+Loaded by pytest automatically; the test scripts also import from it directly.
+"""
+import os
+import sys
+
+# No X11/Wayland display (e.g. CI or SSH): visual tests cannot open a window
+HEADLESS = sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+def skip_without_display() -> bool:
+    """Skip a visual test when headless; returns True if the caller should bail out."""
+    if not HEADLESS:
+        return False
+    if 'pytest' in sys.modules:
+        import pytest
+        pytest.skip("no display available for visual test")
+    print("  ⚠️  No display available - visual test skipped")
+    return True
+
+# Windowed tests need someone at the keyboard; opt in with RUN_INTERACTIVE=1
+RUN_INTERACTIVE = os.environ.get('RUN_INTERACTIVE') == '1'
+
+def skip_unless_interactive() -> bool:
+    """Skip a keyboard-driven test unless RUN_INTERACTIVE=1; returns True if the caller should bail out."""
+    if RUN_INTERACTIVE:
+        return False
+    if 'pytest' in sys.modules:
+        import pytest
+        pytest.skip("interactive test (set RUN_INTERACTIVE=1 to run)")
+    print("  ⚠️  Interactive test skipped (set RUN_INTERACTIVE=1 to run)")
+    return True
+
+def run_until_failure(tests) -> list:
+    """Run tests in order, stopping after the first one that reports failure."""
+    results = []
+    for test in tests:
+        results.append(test())
+        if not results[-1]:
+            print(f"\n❌ {test.__name__} failed - skipping remaining tests")
+            break
+    return results
@@ -9,6 +9,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 import time
 import cv2
+import numpy as np
 from video_engine import VideoEngine
 
 def create_test_video():
@@ -24,10 +25,10 @@ def create_test_video():
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     out = cv2.VideoWriter(test_path, fourcc, 30.0, (1920, 1080))
     
-    # Create 90 frames (3 seconds at 30fps)
+    # Create 90 frames (3 seconds at 30fps), refilling one frame buffer
+    frame = np.empty((1080, 1920, 3), dtype=np.uint8)
     for i in range(90):
-        # Create frame with changing color
-        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        # Fill frame with changing color
         color_intensity = int(128 + 127 * np.sin(i * 0.1))
         frame[:, :] = [color_intensity, 100, 200]  # BGR
         
@@ -139,6 +140,60 @@ def test_video_switching():
     engine.cleanup()
     return True
 
+def test_frame_pacing():
+    """Test deadline-based frame pacing sleeps to the deadline and drops missed slots."""
+    print("\n=== Testing Frame Pacing ===")
+    
+    engine = VideoEngine(headless=True)
+    frame_time = 1.0 / 30.0
+    
+    try:
+        # On schedule: sleep until the deadline, nothing dropped
+        deadline = time.monotonic() + 0.02
+        next_deadline, dropped = engine._pace_frame(deadline, frame_time)
+        assert time.monotonic() >= deadline, "Should sleep until the deadline"
+        assert (next_deadline, dropped) == (deadline, 0), "On-time frame should keep its deadline"
+        
+        # 3.5 frames behind: skip the 3 whole missed slots instead of sleeping
+        late = time.monotonic() - 3.5 * frame_time
+        next_deadline, dropped = engine._pace_frame(late, frame_time)
+        assert dropped == 3, f"Expected 3 dropped frames, got {dropped}"
+        assert abs(next_deadline - (late + 3 * frame_time)) < 1e-9, "Deadline should advance by dropped frames"
+        print("  ✅ Pacing sleeps to deadlines and drops missed frames")
+    finally:
+        engine.cleanup()
+    
+    return True
+
+def test_present_ring():
+    """Test the two-slot present ring copies frames and drops when full."""
+    print("\n=== Testing Present Ring ===")
+    
+    engine = VideoEngine(headless=True)
+    
+    try:
+        frames = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(3)]
+        for frame in frames:
+            engine._submit_for_present(frame)
+        
+        # Third frame is dropped because the presenter has not consumed any slot
+        assert engine._present_head == 2, f"Expected 2 queued frames, got {engine._present_head}"
+        assert [int(slot[0, 0, 0]) for slot in engine._present_ring] == [0, 1], "Slots should hold frames 0 and 1"
+        
+        # Slots are copies, so the producer may reuse its buffer right away
+        frames[0][:] = 99
+        assert engine._present_ring[0][0, 0, 0] == 0, "Ring slot should not alias the submitted frame"
+        
+        # Once the presenter consumes a slot, the producer can write again
+        engine._present_tail = 1
+        engine._submit_for_present(frames[2])
+        assert engine._present_head == 3 and engine._present_ring[0][0, 0, 0] == 2, "Freed slot should be reused"
+        print("  ✅ Present ring hands off frames without blocking the producer")
+    finally:
+        engine.cleanup()
+    
+    return True
+
 def main():
     """Run all Stage 1 tests."""
     print("Halloween Projection Mapper - Stage 1 Tests")
@@ -154,13 +209,21 @@ def main():
         # Test 3: Video switching
         switching_success = test_video_switching()
         
+        # Test 4: Frame pacing
+        pacing_success = test_frame_pacing()
+        
+        # Test 5: Present ring
+        ring_success = test_present_ring()
+        
         # Results
         print("\n=== Test Results ===")
         print(f"Preloading: {'PASS' if preload_success else 'FAIL'}")
         print(f"Playback: {'PASS' if playback_success else 'FAIL'}")
         print(f"Switching: {'PASS' if switching_success else 'FAIL'}")
+        print(f"Pacing: {'PASS' if pacing_success else 'FAIL'}")
+        print(f"Present ring: {'PASS' if ring_success else 'FAIL'}")
         
-        if all([preload_success, playback_success, switching_success]):
+        if all([preload_success, playback_success, switching_success, pacing_success, ring_success]):
             print("\n✅ Stage 1 tests PASSED - Video engine ready!")
             return True
         else:
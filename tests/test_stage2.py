@@ -3,6 +3,7 @@
 Stage 2 Test Script - Mask UI Verification
 Tests mask management, drag-and-drop corners, and persistence.
 """
+import io
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -12,6 +13,7 @@ import cv2
 import numpy as np
 from mask_manager import MaskManager, StripMask
 from video_engine import VideoEngine
+from conftest import run_until_failure, skip_without_display
 
 def test_mask_creation():
     """Test mask creation and default configuration."""
@@ -59,6 +61,14 @@ def test_mask_persistence():
     # Verify persistence
     assert loaded_corners == modified_corners, "Corners should persist across save/load"
     
+    # Round-trip through an in-memory stream as well
+    buf = io.BytesIO()
+    manager1.save_masks(buf)
+    buf.seek(0)
+    manager2.masks[0].corners[0].move_to(0, 0)
+    manager2.load_masks(buf)
+    assert manager2.masks[0].get_corner_positions() == modified_corners, "Corners should persist through a stream"
+    
     print("✅ Mask persistence test passed")
     return True
 
@@ -86,6 +96,10 @@ def test_corner_detection():
     found_corner = mask.find_corner_at_point(500, 500)
     assert found_corner is None, "Should not find corner at distant point"
     
+    # Batched lookup agrees with the scalar one
+    hits = mask.find_corners_at_points(np.array([105, 500]), np.array([105, 500]))
+    assert hits.tolist() == [0, -1], f"Batch lookup should return [0, -1], got {hits.tolist()}"
+    
     print("✅ Corner detection test passed")
     return True
 
@@ -171,6 +185,60 @@ def test_width_mode_crop():
     print("✅ Width crop mode test passed")
     return True
 
+def test_scaled_edit_overlay():
+    """Test drawing the edit overlay onto a downscaled preview canvas."""
+    print("\n=== Testing Scaled Edit Overlay ===")
+
+    manager = MaskManager()
+    manager.handle_keyboard_event(ord('e'))
+    manager.handle_keyboard_event(ord('w'))
+
+    preview = np.zeros((720, 1280, 3), dtype=np.uint8)
+    manager.draw_edit_overlay(preview, scale=1280 / 1920)
+    assert preview.any(), "Overlay should draw onto the preview canvas"
+
+    # Hit-testing must stay in projection coordinates
+    assert manager.last_overlay_height == 1080, f"Expected full-frame height, got {manager.last_overlay_height}"
+    left_handle, _ = manager._get_width_handle_positions(manager.last_overlay_height)
+    assert manager._find_width_handle_at_point(*left_handle) == 'left', "Handle should be hit at full-res position"
+
+    print("✅ Scaled edit overlay test passed")
+    return True
+
+def test_mask_application_matches_warp():
+    """Test cached single-remap masking against per-strip perspective warps."""
+    print("\n=== Testing Mask Application ===")
+
+    manager = MaskManager("config/test_masks.json")
+    manager.masks[1].corners[0].move_to(100, 200)
+    manager.masks[4].corners[2].move_to(1700, 880)
+
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    frame[:, :, 0] = np.arange(1920, dtype=np.uint16)[None, :] % 256
+    frame[:, :, 1] = np.arange(1080, dtype=np.uint16)[:, None] % 256
+    frame[:, :, 2] = 128
+
+    # Reference: warp each strip and composite through its polygon mask
+    expected = np.zeros_like(frame)
+    for mask, transform in zip(manager.masks, manager.get_projection_transforms()):
+        warped = cv2.warpPerspective(frame, transform, (1920, 1080))
+        region = np.zeros((1080, 1920), dtype=np.uint8)
+        cv2.fillPoly(region, [mask.get_mask_points()], 255)
+        expected[region == 255] = warped[region == 255]
+
+    output = manager.apply_masks_to_frame(frame).copy()
+    diff = np.abs(output.astype(np.int16) - expected.astype(np.int16))
+    assert output.shape == frame.shape, "Output should keep frame shape"
+    assert np.mean(diff > 2) < 0.001, "Remap output should match per-strip warps"
+
+    # Geometry change must invalidate the cached tables
+    manager.masks[0].corners[1].move_to(1500, 0)
+    moved = manager.apply_masks_to_frame(frame)
+    assert not np.array_equal(moved, output), "Moving a corner should change output"
+
+    print("✅ Mask application test passed")
+    return True
+
 def test_visual_mask_editing():
     """Interactive test for visual mask editing."""
     print("\n=== Visual Mask Editing Test ===")
@@ -183,42 +251,39 @@ def test_visual_mask_editing():
     print("  - Press 'R' to reset to defaults")
     print("  - Press ESC to exit test")
     
+    if skip_without_display():
+        return True
+    
     # Create engine with mask integration
     engine = VideoEngine()
     
-    # Create a test pattern frame
-    test_frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    # Create a test pattern frame: one color per 180-row strip, alternating for visibility
+    strip_colors = np.array([(100 + i * 20, 150, 200 - i * 20) for i in range(6)], dtype=np.uint8)
+    color_lut = np.repeat(strip_colors, 180, axis=0)
+    test_frame = np.empty((1080, 1920, 3), dtype=np.uint8)
+    test_frame[:] = color_lut[:, None, :]
     
-    # Draw test pattern with numbered strips
+    # Add strip numbers
     for i in range(6):
-        y_start = i * 180
-        y_end = (i + 1) * 180
-        
-        # Alternate colors for visibility
-        color = (100 + i * 20, 150, 200 - i * 20)
-        test_frame[y_start:y_end, :] = color
-        
-        # Add strip number
         cv2.putText(test_frame, f"Strip {i + 1}", 
-                   (960, y_start + 90), 
+                   (960, i * 180 + 90), 
                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
     
+    # Reused every iteration; the edit overlay is redrawn on a fresh copy of the pattern
+    display_frame = np.empty_like(test_frame)
+    
     print("Opening visual test window... Press ESC when done.")
     
-    start_time = time.time()
-    while time.time() - start_time < 30:  # 30 second timeout
+    # The engine's presenter thread shows frames and routes keys to the mask
+    # manager (ESC sets exit_requested), so this loop never blocks on the GUI
+    deadline_ns = time.monotonic_ns() + 30 * 10**9  # 30 second timeout
+    while time.monotonic_ns() < deadline_ns and not engine.exit_requested:
         # Display frame with masks
-        display_frame = test_frame.copy()
+        np.copyto(display_frame, test_frame)
         engine.mask_manager.draw_edit_overlay(display_frame)
         
-        cv2.imshow(engine.window_name, display_frame)
-        
-        # Handle input
-        key = cv2.waitKey(30) & 0xFF
-        if key == 27:  # ESC
-            break
-        elif key != 255:
-            engine.mask_manager.handle_keyboard_event(key)
+        engine._submit_for_present(display_frame)
+        time.sleep(0.033)
     
     engine.cleanup()
     print("✅ Visual test completed")
@@ -228,6 +293,9 @@ def test_mask_integration_with_video():
     """Test mask system integration with video playback."""
     print("\n=== Testing Mask Integration with Video ===")
     
+    if skip_without_display():
+        return True
+    
     engine = VideoEngine()
     engine.preload_videos(['media/active', 'media/ambient'])
     
@@ -240,13 +308,10 @@ def test_mask_integration_with_video():
             print("Video playing with mask overlay...")
             print("Press 'E' to toggle edit mode, ESC to exit")
             
-            start_time = time.time()
-            while time.time() - start_time < 10:  # 10 second test
-                key = cv2.waitKey(30) & 0xFF
-                if key == 27:  # ESC
-                    break
-                elif key != 255:
-                    engine.mask_manager.handle_keyboard_event(key)
+            # Keys reach the mask manager through the engine's presenter thread
+            deadline_ns = time.monotonic_ns() + 10 * 10**9  # 10 second test
+            while time.monotonic_ns() < deadline_ns and not engine.exit_requested:
+                time.sleep(0.033)
             
             engine.stop_playback()
             print("✅ Video integration test completed")
@@ -264,32 +329,36 @@ def main():
     print("=" * 50)
     
     try:
-        # Unit tests
+        # Unit tests (stop at the first failure)
         unit_tests = [
-            test_mask_creation(),
-            test_mask_persistence(),
-            test_corner_detection(),
-            test_keyboard_handling(),
-            test_width_mode_crop(),
+            test_mask_creation,
+            test_mask_persistence,
+            test_corner_detection,
+            test_keyboard_handling,
+            test_width_mode_crop,
+            test_scaled_edit_overlay,
+            test_mask_application_matches_warp,
         ]
-        test_results = unit_tests.copy()
+        test_results = run_until_failure(unit_tests)
+        unit_passed = all(test_results)
         
         # Interactive tests
-        print("\n" + "=" * 50)
-        print("INTERACTIVE TESTS")
-        print("=" * 50)
-        
-        response = input("Run visual mask editing test? (y/n): ").lower()
-        if response == 'y':
-            test_results.append(test_visual_mask_editing())
-        
-        response = input("Run video integration test? (y/n): ").lower()
-        if response == 'y':
-            test_results.append(test_mask_integration_with_video())
+        if unit_passed:
+            print("\n" + "=" * 50)
+            print("INTERACTIVE TESTS")
+            print("=" * 50)
+            
+            response = input("Run visual mask editing test? (y/n): ").lower()
+            if response == 'y':
+                test_results.append(test_visual_mask_editing())
+            
+            response = input("Run video integration test? (y/n): ").lower()
+            if response == 'y':
+                test_results.append(test_mask_integration_with_video())
         
         # Results
         print("\n=== Test Results ===")
-        print(f"Unit tests: {'PASS' if all(unit_tests) else 'FAIL'}")
+        print(f"Unit tests: {'PASS' if unit_passed else 'FAIL'}")
         
         if all(test_results):
             print("\n✅ Stage 2 tests PASSED - Mask system ready!")
@@ -7,12 +7,49 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+import asyncio
+import functools
+import importlib.util
+import socket
 import time
 import json
+import queue
 import threading
-from typing import List, Tuple
-from mqtt_handler import MQTTHandler, MQTTSimulator, test_mqtt_handler
-from video_engine import VideoEngine
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+import mqtt_handler
+from mqtt_handler import MQTTHandler, AsyncMQTTHandler, MQTTSimulator, LoopbackBridge, test_mqtt_handler, _try_fast_parse
+from net_tuning import tune_socket
+from video_engine import VideoEngine, PreloadedVideo
+from conftest import run_until_failure, skip_without_display
+
+try:
+    import pytest
+except ImportError:  # The stage scripts also run without pytest
+    pytest = None
+
+# The interactive test needs OpenCV's GUI; checked once at import
+HAS_CV2 = importlib.util.find_spec("cv2") is not None
+
+# Test media: probed once per module (or once per script run in main())
+_TEST_MEDIA_FOLDERS = ('media/active', 'media/ambient')
+
+def load_media_library() -> Dict[str, PreloadedVideo]:
+    """Probe the test media folders with a throwaway (windowless) engine."""
+    engine = VideoEngine(headless=True)
+    try:
+        return engine._load_library(list(_TEST_MEDIA_FOLDERS))
+    finally:
+        engine.cleanup()
+
+if pytest is not None:
+    media_library = pytest.fixture(scope="module", name="media_library")(load_media_library)
+
+def make_preloaded_engine(library: Dict[str, PreloadedVideo]) -> VideoEngine:
+    """Create a VideoEngine with the shared test library preloaded."""
+    engine = VideoEngine()
+    engine.add_preloaded_videos(library)
+    return engine
 
 def test_mqtt_message_parsing():
     """Test MQTT message parsing and validation."""
@@ -26,34 +63,109 @@ def test_mqtt_message_parsing():
     
     handler.set_message_callback(capture_callback)
     
-    # Test valid messages
-    test_cases = [
-        ('{"state": "active", "media": "active_01"}', ("active", "active_01")),
-        ('{"state": "ambient", "media": "ambient_01"}', ("ambient", "ambient_01")),
-        ('{"state": "ambient"}', ("ambient", None)),
-        ('{"state": "invalid", "media": "test"}', ("ambient", "test")),  # Invalid state -> ambient
-    ]
-    
-    class MockMessage:
-        def __init__(self, payload):
-            self.payload = payload.encode()
+    # Test valid messages (payloads are bytes, as paho delivers them)
+    test_cases = (
+        (b'{"state": "active", "media": "active_01"}', ("active", "active_01")),
+        (b'{"state": "ambient", "media": "ambient_01"}', ("ambient", "ambient_01")),
+        (b'{"state": "ambient"}', ("ambient", None)),
+        (b'{"state": "invalid", "media": "test"}', ("ambient", "test")),  # Invalid state -> ambient
+    )
     
-    for i, (message_json, expected) in enumerate(test_cases):
-        handler._on_message(None, None, MockMessage(message_json))
+    for i, (payload, expected) in enumerate(test_cases):
+        handler._on_message(None, None, SimpleNamespace(payload=payload))
         
         if i < len(received_messages):
             actual = received_messages[i]
             assert actual == expected, f"Test {i}: expected {expected}, got {actual}"
-            print(f"  ✅ Message {i+1}: {message_json} -> {actual}")
+            print(f"  ✅ Message {i+1}: {payload.decode()} -> {actual}")
         else:
             print(f"  ❌ Message {i+1}: No callback received")
     
+    # Repeats are dispatched too: they restart (and crossfade) the clip
+    repeat = SimpleNamespace(payload=b'{"state": "ambient", "media": "test"}')
+    dispatched = len(received_messages)
+    handler._on_message(None, None, repeat)
+    assert len(received_messages) == dispatched + 1, "Repeats should be dispatched"
+    
     # Test invalid JSON
-    handler._on_message(None, None, MockMessage('invalid json'))
+    dispatched = len(received_messages)
+    handler._on_message(None, None, SimpleNamespace(payload=b'invalid json'))
+    assert len(received_messages) == dispatched, "Invalid JSON should not be dispatched"
     
     print("✅ MQTT message parsing tests passed")
     return True
 
+def test_fast_payload_parse():
+    """Test the byte-level fast path agrees with json or defers to it."""
+    print("\n=== Testing Fast Payload Parse ===")
+    
+    payloads = [
+        b'{"state":"active","media":"active_01"}',
+        b'{"state":"ambient"}',
+        b'{"state":"ambient","media":null}',
+        b'{"state":"active","media":""}',
+        b'{"state":"active","media":"caf\xc3\xa9"}',
+    ]
+    for payload in payloads:
+        data = json.loads(payload)
+        expected = (data["state"], data.get("media") or None)
+        assert _try_fast_parse(payload) == expected, f"Fast path disagrees on {payload}"
+    
+    # Anything outside the exact controller layout falls back to the generic parser
+    deferred = [
+        b'{"state": "active"}',
+        b'{"state":"bogus","media":"x"}',
+        b'{"state":"active","media":"a\\"b"}',
+        b'{"state":"active","media":"x","animation":"y"}',
+        b'{"state":"active","media":"x"}}',
+        b'{"state":"active',
+    ]
+    for payload in deferred:
+        assert _try_fast_parse(payload) is None, f"Fast path should defer on {payload}"
+    
+    # The fast path only runs when neither msgspec nor orjson is installed; simulate that install
+    fast_calls = []
+    def recording_fast_parse(payload):
+        fast_calls.append(payload)
+        return _try_fast_parse(payload)
+    
+    saved = (mqtt_handler.HAS_MSGSPEC, mqtt_handler.HAS_ORJSON, mqtt_handler._try_fast_parse)
+    mqtt_handler.HAS_MSGSPEC = mqtt_handler.HAS_ORJSON = False
+    mqtt_handler._try_fast_parse = recording_fast_parse
+    try:
+        for payload in payloads + [b'{"state": "active", "media": "active_01"}']:
+            data = json.loads(payload)
+            expected = (data["state"], data.get("media") or None)
+            assert mqtt_handler._decode_playback(memoryview(payload)) == expected, f"Stdlib decode disagrees on {payload}"
+        assert mqtt_handler._decode_playback(b'{"status": "ok"}') is None, "Payload without state should be ignored"
+    finally:
+        mqtt_handler.HAS_MSGSPEC, mqtt_handler.HAS_ORJSON, mqtt_handler._try_fast_parse = saved
+    assert len(fast_calls) == len(payloads) + 2, "Stdlib-only decoding should try the fast path first"
+    
+    print("✅ Fast payload parse test passed")
+    return True
+
+def test_socket_tuning():
+    """Test Nagle is disabled on TCP sockets and unix sockets are left alone."""
+    print("\n=== Testing MQTT Socket Tuning ===")
+    
+    tcp_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        tune_socket(None, None, tcp_sock)
+        assert tcp_sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY), "TCP_NODELAY should be set"
+    finally:
+        tcp_sock.close()
+    
+    if hasattr(socket, "AF_UNIX"):
+        unix_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            tune_socket(None, None, unix_sock)  # must not raise
+        finally:
+            unix_sock.close()
+    
+    print("✅ MQTT socket tuning test passed")
+    return True
+
 def test_timeout_functionality():
     """Test MQTT timeout detection and fallback."""
     print("\n=== Testing MQTT Timeout Functionality ===")
@@ -61,42 +173,58 @@ def test_timeout_functionality():
     # Short timeout for testing
     handler = MQTTHandler(timeout_seconds=1)
     timeout_triggered = []
+    fired = threading.Event()
     
     def timeout_callback(state, media):
         if state == "ambient" and media is None:
             timeout_triggered.append(time.time())
+            fired.set()
             print(f"  Timeout callback triggered: {state}, {media}")
     
     handler.set_message_callback(timeout_callback)
     
-    # Start timeout monitoring with old timestamp
-    handler.last_message_time = time.time() - 2  # Set time in past to trigger timeout
-    handler.should_monitor_timeout = True
-    
-    # Manually run one timeout check
-    current_time = time.time()
-    time_since_last_message = current_time - handler.last_message_time
+    # Arm the timeout timer as _on_connect would
+    handler.last_message_time = time.monotonic()
+    handler._timeout_active = True
+    handler._arm_timeout()
     
-    if time_since_last_message > handler.timeout_seconds:
-        print(f"  Triggering timeout: {time_since_last_message:.1f}s > {handler.timeout_seconds}s")
-        handler.current_state = 'ambient'
-        handler.current_media = None
-        handler.message_callback('ambient', None)
-        handler.last_message_time = current_time
+    # Wait for the timer to fire the ambient fallback
+    fired.wait(timeout=3)
     
-    handler.should_monitor_timeout = False
+    handler._cancel_timeout()
     
     assert len(timeout_triggered) > 0, "Timeout should have triggered"
     print("✅ MQTT timeout functionality test passed")
     return True
 
-def test_video_engine_mqtt_integration():
+def test_async_handler_timeout():
+    """Test AsyncMQTTHandler fallback when no messages arrive, even without a broker."""
+    print("\n=== Testing Async MQTT Handler Timeout ===")
+    
+    handler = AsyncMQTTHandler(timeout_seconds=1)
+    fallbacks = []
+    handler.set_message_callback(lambda state, media: fallbacks.append((state, media)))
+    
+    # No broker session at all: the watchdog must fire while disconnected
+    async def watch_briefly():
+        handler.last_message_time = time.monotonic()
+        try:
+            await asyncio.wait_for(handler._watch_timeout(), 1.5)
+        except asyncio.TimeoutError:
+            pass
+    
+    asyncio.run(watch_briefly())
+    
+    assert fallbacks == [("ambient", None)], f"Expected one ambient fallback, got {fallbacks}"
+    print("✅ Async MQTT handler timeout test passed")
+    return True
+
+def test_video_engine_mqtt_integration(media_library: Dict[str, PreloadedVideo]):
     """Test video engine integration with MQTT."""
     print("\n=== Testing Video Engine MQTT Integration ===")
     
     # Create engine without connecting to real MQTT broker
-    engine = VideoEngine()
-    engine.preload_videos(['media/active', 'media/ambient'])
+    engine = make_preloaded_engine(media_library)
     
     # Test state resolution
     available_videos = engine.get_available_videos()
@@ -143,68 +271,111 @@ def test_mqtt_simulator():
         print(f"  ⚠️  MQTT simulator test skipped (no broker): {e}")
         return True
 
-def test_full_mqtt_flow_simulation():
-    """Test complete MQTT flow with simulation."""
-    print("\n=== Testing Full MQTT Flow Simulation ===")
-    
-    # Create video engine
-    engine = VideoEngine()
-    engine.preload_videos(['media/active', 'media/ambient'])
-    
-    # Track state changes
-    state_changes = []
-    original_handle_message = engine._handle_mqtt_message
-    
-    def tracking_handle_message(state, media):
-        state_changes.append((state, media, time.time()))
-        original_handle_message(state, media)
+def test_concurrent_simulator_sequences():
+    """Test that async motion sequences from several simulators overlap on one loop."""
+    print("\n=== Testing Concurrent Simulator Sequences ===")
+    
+    # In-process bridge: no broker needed
+    bridge = LoopbackBridge()
+    handler = MQTTHandler(transport=bridge)
+    received = []
+    handler.set_message_callback(lambda state, media: received.append((state, media)))
+    assert handler.connect(), "Handler should connect to the loopback bridge"
+    
+    simulators = [
+        MQTTSimulator(client_id=f"halloween_controller_simulator_{i}", transport=bridge)
+        for i in range(2)
+    ]
+    for simulator in simulators:
+        assert simulator.connect(), "Simulator should connect to the loopback bridge"
     
-    engine._handle_mqtt_message = tracking_handle_message
+    hold = 0.2
     
-    # Simulate message sequence
-    print("  Simulating MQTT message sequence...")
+    async def run_all():
+        await asyncio.gather(
+            simulators[0].simulate_motion_sequence_async("active_01", hold=hold),
+            simulators[1].simulate_motion_sequence_async("active_02", hold=hold),
+        )
     
-    # Start with ambient
-    engine._handle_mqtt_message("ambient", "test_ambient")
-    time.sleep(0.1)
+    start = time.monotonic()
+    asyncio.run(run_all())
+    elapsed = time.monotonic() - start
     
-    # Motion detected - active
-    engine._handle_mqtt_message("active", "test_ambient")
-    time.sleep(0.1)
+    for simulator in simulators:
+        simulator.disconnect()
+    handler.disconnect()
     
-    # Motion stops - back to ambient
-    engine._handle_mqtt_message("ambient", None)
-    time.sleep(0.1)
+    # Overlapping holds: both actives arrive before either sequence returns to ambient
+    assert received[:2] == [("active", "active_01"), ("active", "active_02")], f"Unexpected order: {received}"
+    assert received[2:] == [("ambient", "ambient_01")] * 2, f"Unexpected order: {received}"
     
-    # Verify state changes
-    assert len(state_changes) >= 3, f"Expected at least 3 state changes, got {len(state_changes)}"
+    print(f"  Two sequences finished in {elapsed:.2f}s")
+    print("✅ Concurrent simulator sequences test passed")
+    return True
+
+def test_full_mqtt_flow_simulation():
+    """Test complete MQTT flow: payload -> applied state -> resolved video -> timeout fallback."""
+    print("\n=== Testing Full MQTT Flow Simulation ===")
     
-    print(f"  State changes recorded: {len(state_changes)}")
-    for i, (state, media, timestamp) in enumerate(state_changes):
-        print(f"    {i+1}. {state} / {media}")
+    # Metadata-only library: resolution needs IDs and categories, not files
+    library = {
+        "ambient_01": PreloadedVideo("media/ambient/ambient_01.mp4", "ambient"),
+        "active_scare": PreloadedVideo("media/active/active_scare.mp4", "active"),
+    }
+    engine = VideoEngine(headless=True)
+    engine.add_preloaded_videos(library)
+    engine.config_manager.set_state_change_buffer_ms(0)
+    handler = engine.mqtt_handler
+    
+    # Record which video each message switches to instead of opening players
+    started = []
+    engine.start_playback = lambda video_id: started.append(video_id) or True
+    
+    def deliver(payload: bytes):
+        handler._on_message(None, None, SimpleNamespace(payload=payload))
+    
+    # Start with ambient (no media: the fallback ambient clip)
+    deliver(b'{"state": "ambient"}')
+    assert (engine.current_state, handler.current_media) == ("ambient", None), "Ambient state should be applied"
+    assert started == ["ambient_01"], f"Ambient without media should play the fallback, got {started}"
+    
+    # Motion detected - active, media given without its state prefix
+    deliver(b'{"state": "active", "media": "scare"}')
+    assert (engine.current_state, handler.current_media) == ("active", "scare"), "Active state/media should be applied"
+    assert started[-1] == "active_scare", f"'scare' should resolve to active_scare, got {started[-1]}"
+    
+    # Controller goes quiet - the timeout falls back to ambient
+    handler.last_message_time -= handler.timeout_seconds
+    handler._fire_timeout()
+    assert (engine.current_state, handler.current_state, handler.current_media) == ("ambient", "ambient", None), \
+        "Timeout should apply the ambient state"
+    assert started == ["ambient_01", "active_scare", "ambient_01"], f"Timeout should return to ambient_01, got {started}"
+    
+    print(f"  Videos started: {started}")
     
     engine.cleanup()
     print("✅ Full MQTT flow simulation test passed")
     return True
 
-def test_system_status():
+# Keys get_system_status() is expected to report
+EXPECTED_STATUS_KEYS = frozenset({"video_engine", "mqtt", "masks"})
+EXPECTED_VIDEO_STATUS_KEYS = frozenset({"current_video", "is_playing", "current_state"})
+
+def test_system_status(media_library: Dict[str, PreloadedVideo]):
     """Test system status reporting."""
     print("\n=== Testing System Status ===")
     
-    engine = VideoEngine()
-    engine.preload_videos(['media/active', 'media/ambient'])
+    engine = make_preloaded_engine(media_library)
     
     status = engine.get_system_status()
     
     # Verify status structure
-    assert "video_engine" in status, "Status should include video_engine"
-    assert "mqtt" in status, "Status should include mqtt"
-    assert "masks" in status, "Status should include masks"
+    missing = EXPECTED_STATUS_KEYS - status.keys()
+    assert not missing, f"Status missing sections: {sorted(missing)}"
     
     video_status = status["video_engine"]
-    assert "current_video" in video_status, "Should include current_video"
-    assert "is_playing" in video_status, "Should include is_playing"
-    assert "current_state" in video_status, "Should include current_state"
+    missing = EXPECTED_VIDEO_STATUS_KEYS - video_status.keys()
+    assert not missing, f"Video engine status missing keys: {sorted(missing)}"
     
     print(f"  System status keys: {list(status.keys())}")
     print(f"  Video engine status: {video_status}")
@@ -213,15 +384,17 @@ def test_system_status():
     print("✅ System status test passed")
     return True
 
-def run_interactive_mqtt_test():
+def run_interactive_mqtt_test(media_library: Dict[str, PreloadedVideo]):
     """Interactive test with real or simulated MQTT."""
     print("\n=== Interactive MQTT Test ===")
     print("This test demonstrates MQTT communication with video switching.")
     print("You can use an external MQTT client to send messages to 'halloween/playback'")
     
+    if skip_without_display():
+        return True
+    
     # Create engine
-    engine = VideoEngine()
-    engine.preload_videos(['media/active', 'media/ambient'])
+    engine = make_preloaded_engine(media_library)
     
     available_videos = engine.get_available_videos()
     if not available_videos:
@@ -246,15 +419,25 @@ def run_interactive_mqtt_test():
     if engine.fallback_ambient_video:
         engine.start_playback(engine.fallback_ambient_video)
     
-    start_time = time.time()
-    while time.time() - start_time < 30:  # 30 second test
-        key = cv2.waitKey(100) & 0xFF
+    # The engine's presenter thread pumps the window; keys the parameter UI and
+    # mask manager don't consume are posted here instead of to the app handler
+    keys = queue.SimpleQueue()
+    # Video used when 'M' simulates motion
+    active_video = next((v for v in available_videos if 'active' in v), available_videos[0])
+    app_keys = engine._handle_application_keys
+    engine._handle_application_keys = keys.put
+    
+    deadline_ns = time.monotonic_ns() + 30 * 10**9  # 30 second test
+    while time.monotonic_ns() < deadline_ns and not engine.exit_requested:
+        try:
+            key = keys.get(timeout=0.1)
+        except queue.Empty:
+            continue
         
         if key == 27:  # ESC
             break
         elif key == ord('m') or key == ord('M'):
             # Simulate motion detection
-            active_video = next((v for v in available_videos if 'active' in v), available_videos[0])
             print(f"  Simulating motion -> active: {active_video}")
             engine._handle_mqtt_message("active", active_video)
         elif key == ord('a') or key == ord('A'):
@@ -265,9 +448,9 @@ def run_interactive_mqtt_test():
             # Show status
             status = engine.get_system_status()
             print(f"  Status: {json.dumps(status, indent=2)}")
-        elif key != 255:
-            # Pass other keys to mask manager
-            engine.mask_manager.handle_keyboard_event(key)
+        else:
+            # Remaining application keys (P, C, I, L, ...)
+            app_keys(key)
     
     engine.cleanup()
     print("✅ Interactive MQTT test completed")
@@ -279,31 +462,40 @@ def main():
     print("=" * 50)
     
     try:
-        # Unit tests
-        test_results = [
-            test_mqtt_handler(),  # From mqtt_handler.py
-            test_mqtt_message_parsing(),
-            test_timeout_functionality(),
-            test_video_engine_mqtt_integration(),
-            test_mqtt_simulator(),
-            test_full_mqtt_flow_simulation(),
-            test_system_status(),
-        ]
+        # Engine tests share one probe of the media library, as under pytest
+        library = load_media_library()
         
-        # Interactive test
-        print("\n" + "=" * 50)
-        print("INTERACTIVE TEST")
-        print("=" * 50)
+        def with_library(test):
+            return functools.update_wrapper(functools.partial(test, library), test)
         
-        try:
-            import cv2
-            response = input("Run interactive MQTT test? (y/n): ").lower()
-            if response == 'y':
-                test_results.append(run_interactive_mqtt_test())
-        except ImportError:
-            print("  ⚠️  OpenCV not available for interactive test")
-        except EOFError:
-            print("  ⚠️  Interactive test skipped (non-interactive environment)")
+        # Unit tests (stop at the first failure)
+        test_results = run_until_failure([
+            test_mqtt_handler,  # From mqtt_handler.py
+            test_mqtt_message_parsing,
+            test_fast_payload_parse,
+            test_socket_tuning,
+            test_timeout_functionality,
+            test_async_handler_timeout,
+            with_library(test_video_engine_mqtt_integration),
+            test_mqtt_simulator,
+            test_concurrent_simulator_sequences,
+            test_full_mqtt_flow_simulation,
+            with_library(test_system_status),
+        ])
+        
+        # Interactive test
+        if all(test_results):
+            print("\n" + "=" * 50)
+            print("INTERACTIVE TEST")
+            print("=" * 50)
+            
+            try:
+                if not HAS_CV2:
+                    print("  ⚠️  OpenCV not available for interactive test")
+                elif input("Run interactive MQTT test? (y/n): ").lower() == 'y':
+                    test_results.append(run_interactive_mqtt_test(library))
+            except EOFError:
+                print("  ⚠️  Interactive test skipped (non-interactive environment)")
         
         # Results
         print("\n=== Test Results ===")
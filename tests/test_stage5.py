@@ -9,6 +9,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'tools'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 import tempfile
+import json
+import shutil
 import subprocess
 from pathlib import Path
 import cv2
@@ -29,16 +31,16 @@ def create_test_video(output_path: str, duration_seconds: int = 3,
         
         # Generate frames
         total_frames = duration_seconds * fps
+        
+        # Rotating color pattern: convert the whole hue ramp in one call
+        hues = (np.arange(total_frames) * 180 // max(total_frames, 1)).astype(np.uint8)
+        hsv_ramp = np.stack([hues, np.full_like(hues, 255), np.full_like(hues, 200)], axis=1)
+        bgr_ramp = cv2.cvtColor(hsv_ramp.reshape(-1, 1, 3), cv2.COLOR_HSV2BGR).reshape(-1, 3)
+        
+        # One frame buffer, refilled each iteration
+        frame = np.empty((height, width, 3), dtype=np.uint8)
         for i in range(total_frames):
-            # Create frame with changing pattern
-            frame = np.zeros((height, width, 3), dtype=np.uint8)
-            
-            # Rotating color pattern
-            hue = int((i / total_frames) * 180)
-            color_hsv = np.uint8([[[hue, 255, 200]]])
-            color_bgr = cv2.cvtColor(color_hsv, cv2.COLOR_HSV2BGR)[0][0]
-            
-            frame[:, :] = color_bgr
+            frame[:] = bgr_ramp[i]
             
             # Add frame number
             cv2.putText(frame, f"Frame {i}", (50, height//2), 
@@ -137,7 +139,8 @@ def test_encoding_needs_detection():
     with tempfile.TemporaryDirectory() as temp_dir:
         # Test 1: Video that needs encoding (wrong resolution)
         test_video1 = os.path.join(temp_dir, "needs_encoding.mp4")
-        create_test_video(test_video1, width=640, height=480)  # Not 1920x1080
+        # needs_encoding only probes stream metadata, so 1s clips are enough
+        create_test_video(test_video1, duration_seconds=1, width=640, height=480)  # Not 1920x1080
         
         needs_encoding, reason = encoder.needs_encoding(test_video1)
         print(f"   640x480 video: {needs_encoding} ({reason})")
@@ -145,7 +148,7 @@ def test_encoding_needs_detection():
         
         # Test 2: Create a properly formatted video (if possible)
         test_video2 = os.path.join(temp_dir, "proper_format.mp4")
-        create_test_video(test_video2, width=1920, height=1080, fps=30)
+        create_test_video(test_video2, duration_seconds=1, width=1920, height=1080, fps=30)
         
         needs_encoding2, reason2 = encoder.needs_encoding(test_video2)
         print(f"   1920x1080 video: {needs_encoding2} ({reason2})")
@@ -153,6 +156,79 @@ def test_encoding_needs_detection():
         print("✅ Encoding needs detection test passed")
         return True
 
+def test_needs_encoding_rules():
+    """Test the needs-encoding decision against canned probe results (no FFmpeg)."""
+    print("\n=== Testing Needs-Encoding Rules ===")
+    
+    encoder = VideoEncoder()
+    optimized = {'duration': 1.0, 'width': 1920, 'height': 1080, 'fps': 30.0,
+                 'codec': 'h264', 'bitrate': 5_000_000, 'pix_fmt': 'yuv420p',
+                 'profile': 'High', 'level': 40, 'format': 'mov,mp4,m4a,3gp,3g2,mj2'}
+    
+    encoder.get_video_info = lambda path: dict(optimized)
+    needs_encoding, reason = encoder.needs_encoding("optimized.mp4")
+    assert not needs_encoding, f"Optimized video should not need encoding ({reason})"
+    
+    encoder.get_video_info = lambda path: dict(optimized, width=640, height=480, codec='mpeg4', fps=25.0)
+    needs_encoding, reason = encoder.needs_encoding("small.mp4")
+    print(f"   640x480 mpeg4 25fps: {needs_encoding} ({reason})")
+    assert needs_encoding, "Wrong resolution/codec/fps should need encoding"
+    assert "Resolution" in reason and "Codec" in reason and "FPS" in reason, f"All issues should be reported: {reason}"
+    
+    # Right stream in the wrong container is remuxed, not re-encoded
+    mkv = dict(optimized, format='matroska,webm')
+    encoder.get_video_info = lambda path: mkv
+    needs_encoding, reason = encoder.needs_encoding("optimized.mkv")
+    assert needs_encoding and "Format" in reason, f"MKV should need converting ({reason})"
+    cmd = encoder._build_ffmpeg_command("optimized.mkv", "optimized.mp4", mkv)
+    assert cmd[cmd.index('-c:v') + 1] == 'copy', "Matching stream should be copied"
+    cmd = encoder._build_ffmpeg_command("small.mp4", "out.mp4", dict(optimized, codec='mpeg4'))
+    assert cmd[cmd.index('-c:v') + 1] != 'copy', "Mismatched stream should be re-encoded"
+    
+    # Only streams the Pi's decoder is sure to take are copied
+    for overrides in ({'pix_fmt': 'yuv420p10le', 'profile': 'High 10'}, {'level': 51},
+                      {'bitrate': 12_000_000}, {'bitrate': 0}):
+        cmd = encoder._build_ffmpeg_command("optimized.mkv", "optimized.mp4", dict(mkv, **overrides))
+        assert cmd[cmd.index('-c:v') + 1] != 'copy', f"Stream with {overrides} should be re-encoded"
+    
+    encoder.get_video_info = lambda path: None
+    needs_encoding, reason = encoder.needs_encoding("unreadable.mp4")
+    assert needs_encoding, "Unreadable video should need encoding"
+    
+    print("✅ Needs-encoding rules test passed")
+    return True
+
+def test_probe_cache():
+    """Test that persisted probe results are reused while the file is unchanged."""
+    print("\n=== Testing Probe Cache ===")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, "clip.mp4")
+        with open(video, 'wb') as f:
+            f.write(b"not decoded - served from the cache")
+        st = os.stat(video)
+        
+        info = {'duration': 1.0, 'width': 1920, 'height': 1080, 'fps': 30.0,
+                'codec': 'h264', 'bitrate': 0, 'format': 'mp4'}
+        cache_path = os.path.join(temp_dir, "video_info.json")
+        with open(cache_path, 'w') as f:
+            json.dump({os.path.abspath(video): {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'info': info}}, f)
+        
+        # A cache hit never runs ffprobe, so force the availability flag
+        encoder = VideoEncoder(cache_path=cache_path)
+        encoder.ffmpeg_available = True
+        assert encoder.get_video_info(video) == info, "Unchanged file should be served from the cache"
+        needs_encoding, reason = encoder.needs_encoding(video)
+        assert not needs_encoding, f"Cached 1080p h264 info should not need encoding ({reason})"
+        
+        # A corrupt cache file is ignored rather than fatal
+        with open(cache_path, 'w') as f:
+            f.write("{not json")
+        assert VideoEncoder(cache_path=cache_path)._info_cache == {}, "Corrupt cache should start empty"
+    
+    print("✅ Probe cache test passed")
+    return True
+
 def test_video_encoding():
     """Test actual video encoding functionality."""
     print("\n=== Testing Video Encoding ===")
@@ -238,8 +314,11 @@ def test_batch_processor():
             active_dir / "active_02.avi",  # Different format
         ]
         
+        # Encode one clip and copy it; only scanning/probing is under test here
+        template = os.path.join(temp_dir, "template.mp4")
+        assert create_test_video(template, duration_seconds=1, width=320, height=240), "Could not create template video"
         for video_path in test_videos:
-            create_test_video(str(video_path), duration_seconds=1, width=320, height=240)
+            shutil.copyfile(template, video_path)
         
         # Create batch processor
         processor = VideoBatchProcessor(str(media_dir))
@@ -254,10 +333,34 @@ def test_batch_processor():
         encoder = VideoEncoder()
         if encoder.ffmpeg_available:
             print("   Testing encoding needs:")
-            for video in found_videos:
-                needs_encoding, reason = encoder.needs_encoding(str(video))
+            checks = processor.check_all(found_videos)
+            assert len(checks) == len(found_videos), "Should return one result per video"
+            for video, (needs_encoding, reason) in zip(found_videos, checks):
                 print(f"     {video.name}: {needs_encoding} ({reason})")
         
+        # Parallel checks keep input order (canned probe results, no FFmpeg needed)
+        processor.encoder.get_video_info = lambda path: {
+            'duration': 1.0, 'width': 1920 if path.endswith('ambient_01.mp4') else 320,
+            'height': 1080 if path.endswith('ambient_01.mp4') else 240,
+            'fps': 30.0, 'codec': 'h264', 'bitrate': 0, 'format': 'mp4'}
+        checks = processor.check_all(test_videos)
+        assert [needs for needs, _ in checks] == [True, False, True], f"Results out of order: {checks}"
+        
+        # Parallel batch: the two small clips are encoded, the 1080p one skipped
+        thread_counts = []
+        def fake_encode(input_path, output_path, progress_callback=None):
+            thread_counts.append(processor.encoder.threads)
+            shutil.copyfile(input_path, output_path)
+            return True
+        processor.encoder.encode_video = fake_encode
+        results = processor.process_batch(test_videos, keep_originals=True, jobs=2)
+        assert len(results['processed']) == 2, f"Should encode 2 videos: {results}"
+        assert results['skipped'] == [str(test_videos[1])], f"Should skip the optimized video: {results}"
+        assert not results['failed'], f"Nothing should fail: {results}"
+        expected_threads = max(1, (os.cpu_count() or 1) // 2)
+        assert thread_counts == [expected_threads] * 2, f"Parallel encodes should share the cores: {thread_counts}"
+        assert processor.encoder.threads is None, "Thread limit should be lifted after the batch"
+        
         print("✅ Batch processor test passed")
         return True
 
@@ -327,7 +430,7 @@ def test_pi_optimization_specs():
         cmd = encoder._build_ffmpeg_command('input.mp4', 'output.mp4')
         
         # Verify key parameters are present
-        assert 'libx264' in cmd, "Should specify H.264 codec"
+        assert (encoder.hw_encoder or 'libx264') in cmd, "Should specify H.264 codec"
         assert '1920x1080' in cmd, "Should specify resolution"
         assert '30' in cmd, "Should specify FPS"
         assert '-an' in cmd, "Should disable audio"
@@ -335,6 +438,25 @@ def test_pi_optimization_specs():
         
         print(f"   ✅ FFmpeg command: {' '.join(cmd[:10])}...")
     
+    # On a Pi with a hardware encoder, x264-only options are left out
+    hw = VideoEncoder()
+    hw.hw_encoder = 'h264_v4l2m2m'
+    hw_cmd = hw._build_ffmpeg_command('input.mp4', 'output.mp4')
+    assert hw_cmd[hw_cmd.index('-c:v') + 1] == 'h264_v4l2m2m', "Should use the hardware encoder"
+    assert '-b:v' in hw_cmd and '-crf' not in hw_cmd and '-preset' not in hw_cmd, "Hardware encoder is bitrate-controlled"
+    assert 'yuv420p' in hw_cmd and '-an' in hw_cmd, "Output format should match the software path"
+    
+    # Speed preset is selectable and validated
+    fast_cmd = VideoEncoder(preset='ultrafast', hw_encode=False)._build_ffmpeg_command('input.mp4', 'output.mp4')
+    assert fast_cmd[fast_cmd.index('-preset') + 1] == 'ultrafast', "Should pass the selected preset"
+    assert fast_cmd[fast_cmd.index('-maxrate') + 1] == '8M', "Software encodes should cap peak bitrate"
+    assert '-threads' not in fast_cmd, "ffmpeg picks the thread count unless limited"
+    try:
+        VideoEncoder(preset='warp-speed')
+        assert False, "Unknown preset should be rejected"
+    except ValueError:
+        pass
+    
     print("✅ Pi optimization specs test passed")
     return True
 
@@ -349,6 +471,8 @@ def main():
             test_ffmpeg_availability(),
             test_pi_optimization_specs(),
             test_video_info_extraction(),
+            test_needs_encoding_rules(),
+            test_probe_cache(),
             test_encoding_needs_detection(),
             test_batch_processor(),
             test_command_line_interface(),
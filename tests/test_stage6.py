@@ -9,7 +9,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 import time
 import threading
-from datetime import datetime, timedelta
+from datetime import datetime
 from error_handler import (
     ErrorHandler, ErrorSeverity, SystemState, ErrorEvent, 
     ErrorCounter, FallbackManager, SystemMonitor, test_error_handling
@@ -34,6 +34,14 @@ def test_error_counter():
     counter.reset()
     assert counter.get_count() == 0, "Should reset to 0"
     
+    # Test window expiry (shrink the window so old errors age out quickly)
+    counter.window_seconds = 0.05
+    counter.add_error()
+    counter.add_error()
+    time.sleep(0.06)
+    assert not counter.add_error(), "Expired errors should not count toward the threshold"
+    assert counter.get_count() == 1, f"Only the recent error should remain, got {counter.get_count()}"
+    
     print("✅ Error counter test passed")
     return True
 
@@ -48,7 +56,6 @@ def test_fallback_manager():
     
     for component in components:
         error_event = ErrorEvent(
-            timestamp=datetime.now(),
             component=component,
             error_type="test_error",
             severity=ErrorSeverity.HIGH,
@@ -61,7 +68,6 @@ def test_fallback_manager():
     
     # Test unknown component
     unknown_error = ErrorEvent(
-        timestamp=datetime.now(),
         component="unknown_component",
         error_type="test_error",
         severity=ErrorSeverity.HIGH,
@@ -85,8 +91,8 @@ def test_system_monitor():
     monitor.start_monitoring()
     assert monitor.monitoring, "Monitor should be running"
     
-    # Let it run briefly
-    time.sleep(1)
+    # Wait for one full round of health checks
+    assert monitor.wait_for_ticks(1, timeout=2.0), "Monitor should complete a round of checks"
     
     monitor.stop_monitoring()
     assert not monitor.monitoring, "Monitor should be stopped"
@@ -141,6 +147,7 @@ def test_error_handler_integration():
     
     # Verify error history
     assert len(error_handler.error_history) == len(test_errors), "Should record all errors"
+    assert isinstance(error_handler.error_history[-1].timestamp, datetime), "Events should expose a datetime timestamp"
     
     # Test error summary
     summary = error_handler.get_error_summary()
@@ -150,6 +157,11 @@ def test_error_handler_integration():
     print(f"  System state: {summary['system_state']}")
     print(f"  Total errors: {summary['total_errors']}")
     
+    # Shrinking the history limit keeps only the newest events
+    error_handler.max_history_size = 2
+    assert len(error_handler.error_history) == 2, "Resized history should be trimmed"
+    assert error_handler.error_history[-1].message == "Critical severity error", "Should keep newest events"
+    
     # Test state reset
     error_handler.reset_system_state()
     summary = error_handler.get_error_summary()
@@ -239,33 +251,33 @@ def test_long_term_stability():
     print("\n=== Testing Long-term Stability ===")
     
     error_handler = ErrorHandler()
+    error_handler.system_monitor.check_interval = 0.01  # Several monitor rounds during the test
     error_handler.start_monitoring()
     
-    # Simulate various errors over time
-    start_time = time.time()
-    error_count = 0
+    # Simulate various errors, driven by iteration count rather than wall time
+    iterations = 50
     
-    print("  Running stability test for 5 seconds...")
+    print(f"  Running stability test for {iterations} iterations...")
     
-    while time.time() - start_time < 5:  # 5 second test
+    for i in range(iterations):
         # Occasionally generate errors
-        if error_count % 10 == 0:
+        if i % 10 == 0:
             error_handler.handle_error(
                 component="stability_test",
                 error_type="periodic_error",
                 severity=ErrorSeverity.LOW,
-                message=f"Stability test error {error_count}",
-                context={"iteration": error_count}
+                message=f"Stability test error {i}",
+                context={"iteration": i}
             )
-        
-        error_count += 1
-        time.sleep(0.1)
+    
+    # Let the monitor run a few health-check rounds alongside the errors
+    assert error_handler.system_monitor.wait_for_ticks(3, timeout=2.0), "Monitor should keep running"
     
     error_handler.stop_monitoring()
     
     # Check system is still operational
     summary = error_handler.get_error_summary()
-    print(f"  Processed {error_count} iterations with {summary['total_errors']} errors")
+    print(f"  Processed {iterations} iterations with {summary['total_errors']} errors")
     
     # System should handle the load
     assert summary["total_errors"] > 0, "Should have generated some errors"
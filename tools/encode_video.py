@@ -10,30 +10,121 @@ import subprocess
 import logging
 import shutil
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from pi_platform import detect_pi_generation
+
+# Prefer orjson for parsing ffprobe output; stdlib json is the fallback
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Concurrent ffprobe processes when checking a batch of videos
+PROBE_WORKERS = 8
+
+# libx264 speed presets selectable from the CLI (fastest first). Faster presets
+# finish much sooner on a Pi at the cost of larger files for the same CRF.
+X264_PRESETS = ('ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow')
+
+# Streams are only copied as-is when the Pi's H.264 decoder is sure to take
+# them: 8-bit 4:2:0 High/Main at level 4.2 or below (ffprobe reports 4.2 as 42)
+COPY_PIX_FMT = 'yuv420p'
+COPY_PROFILES = frozenset(('High', 'Main'))
+COPY_MAX_LEVEL = 42
+
+# Where the CLI keeps probe results between runs
+DEFAULT_INFO_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'halloween', 'video_info.json')
+
+def _hw_h264_candidates() -> Tuple[str, ...]:
+    """Hardware H.264 encoders this board has, best first (empty off-Pi).
+    
+    Pi 4 and earlier have a VideoCore encoder block, exposed through V4L2 M2M
+    (and OMX on legacy stacks); the Pi 5 has none. Generic ffmpeg builds list
+    h264_v4l2m2m everywhere, so the board decides rather than ffmpeg alone.
+    """
+    generation = detect_pi_generation()
+    if generation is None or generation >= 5:
+        return ()
+    if generation == 4:
+        return ('h264_v4l2m2m',)
+    return ('h264_v4l2m2m', 'h264_omx')
+
 class VideoEncoder:
     """Pi-optimized video encoder using FFmpeg."""
     
-    def __init__(self):
+    def __init__(self, preset: str = "medium", cache_path: Optional[str] = None,
+                 hw_encode: bool = True):
+        if preset not in X264_PRESETS:
+            raise ValueError(f"preset must be one of: {', '.join(X264_PRESETS)}")
+        
         self.target_specs = {
             "codec": "libx264",
             "resolution": "1920x1080",
             "fps": 30,
             "profile": "high",
             "level": "4.0",
-            "preset": "medium",
+            "preset": preset,
             "crf": 23,  # Constant Rate Factor for quality
+            # Cap CRF's peaks so playback never outruns the Pi's SD card
+            "maxrate": "8M",
+            "bufsize": "12M",
+            "hw_bitrate": "6M",  # Hardware encoders are bitrate-controlled
             "format": "mp4",
             "audio": False,  # No audio for projection
         }
         
         # Check FFmpeg availability
         self.ffmpeg_available = self._check_ffmpeg()
+        
+        # libx264 threads per encode; None leaves it to ffmpeg (one per core).
+        # Parallel batch encodes lower it so they share the cores.
+        self.threads: Optional[int] = None
+        
+        # Hardware H.264 encoder to use instead of libx264, if any
+        self.hw_encoder = self._detect_hw_encoder() if hw_encode and self.ffmpeg_available else None
+        
+        # Parsed ffprobe results per absolute path, tagged with the file's size
+        # and mtime so a file is only probed again after it changes. With a
+        # cache_path they are also kept on disk between runs.
+        self.cache_path = cache_path
+        self._info_cache: Dict[str, dict] = self._load_info_cache()
+        self._info_cache_dirty = False
+    
+    def _load_info_cache(self) -> Dict[str, dict]:
+        """Load persisted probe results, starting empty if missing or unreadable."""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r') as f:
+                cache = json.load(f)
+            return cache if isinstance(cache, dict) else {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable probe cache {self.cache_path}: {e}")
+            return {}
+    
+    def save_info_cache(self):
+        """Write probe results to cache_path if any were added since the last save."""
+        if not self.cache_path or not self._info_cache_dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._info_cache, f)
+            os.replace(tmp_path, self.cache_path)
+            self._info_cache_dirty = False
+        except OSError as e:
+            logger.warning(f"Could not save probe cache {self.cache_path}: {e}")
     
     def _check_ffmpeg(self) -> bool:
         """Check if FFmpeg is available."""
@@ -50,51 +141,95 @@ class VideoEncoder:
             logger.error("FFmpeg not found. Install with: sudo apt install ffmpeg")
             return False
     
+    def _detect_hw_encoder(self) -> Optional[str]:
+        """Return the first hardware H.264 encoder both the board and ffmpeg support."""
+        candidates = _hw_h264_candidates()
+        if not candidates:
+            return None
+        
+        try:
+            result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                  capture_output=True, text=True, timeout=10)
+        except (subprocess.TimeoutExpired, FileNotFoundError):
+            return None
+        
+        available = {line.split()[1] for line in result.stdout.splitlines()
+                     if len(line.split()) > 1}
+        for encoder in candidates:
+            if encoder in available:
+                logger.info(f"Using hardware encoder {encoder}")
+                return encoder
+        return None
+    
     def get_video_info(self, input_path: str) -> Optional[dict]:
         """Get video information using FFprobe."""
         if not self.ffmpeg_available:
             return None
         
         try:
+            st = os.stat(input_path)
+        except OSError as e:
+            logger.error(f"Error getting video info: {e}")
+            return None
+        cache_key = os.path.abspath(input_path)
+        cached = self._info_cache.get(cache_key)
+        if cached is not None and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+            return dict(cached['info'])
+        
+        try:
+            # Ask only for the fields we use, from the first video stream
             cmd = [
                 'ffprobe',
                 '-v', 'quiet',
                 '-print_format', 'json',
-                '-show_format',
-                '-show_streams',
+                '-select_streams', 'v:0',
+                '-show_entries',
+                'stream=codec_name,codec_type,width,height,r_frame_rate,bit_rate,'
+                'pix_fmt,profile,level'
+                ':format=duration,format_name,bit_rate',
                 input_path
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            # Keep the output as bytes: both parsers accept it without a decode pass
+            result = subprocess.run(cmd, capture_output=True, timeout=30)
             if result.returncode != 0:
-                logger.error(f"FFprobe failed: {result.stderr}")
+                logger.error(f"FFprobe failed: {result.stderr.decode('utf-8', 'replace')}")
                 return None
             
-            info = json.loads(result.stdout)
+            info = orjson.loads(result.stdout) if HAS_ORJSON else json.loads(result.stdout)
             
-            # Extract video stream info
-            video_stream = None
-            for stream in info.get('streams', []):
-                if stream.get('codec_type') == 'video':
-                    video_stream = stream
-                    break
+            # -select_streams v:0 leaves at most the one video stream
+            streams = info.get('streams')
+            video_stream = streams[0] if streams else None
             
             if not video_stream:
                 logger.error("No video stream found")
                 return None
             
+            # Matroska has no per-stream bitrate; the container's overall rate
+            # is an upper bound for the video stream
+            fmt = info.get('format', {})
+            bitrate = video_stream.get('bit_rate') or fmt.get('bit_rate')
+            
             # Parse video info
             video_info = {
-                'duration': float(info.get('format', {}).get('duration', 0)),
+                'duration': float(fmt.get('duration', 0)),
                 'width': int(video_stream.get('width', 0)),
                 'height': int(video_stream.get('height', 0)),
                 'fps': self._parse_fps(video_stream.get('r_frame_rate', '0/1')),
                 'codec': video_stream.get('codec_name', 'unknown'),
-                'bitrate': int(video_stream.get('bit_rate', 0)) if video_stream.get('bit_rate') else 0,
-                'format': info.get('format', {}).get('format_name', 'unknown')
+                'bitrate': int(bitrate) if bitrate else 0,
+                'pix_fmt': video_stream.get('pix_fmt'),
+                'profile': video_stream.get('profile'),
+                'level': video_stream.get('level'),
+                'format': fmt.get('format_name', 'unknown')
             }
             
-            return video_info
+            self._info_cache[cache_key] = {
+                'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'info': video_info,
+            }
+            self._info_cache_dirty = True
+            return dict(video_info)
             
         except (subprocess.TimeoutExpired, json.JSONDecodeError, ValueError) as e:
             logger.error(f"Error getting video info: {e}")
@@ -151,50 +286,118 @@ class VideoEncoder:
             input_info = self.get_video_info(input_path)
             duration = input_info.get('duration', 0) if input_info else 0
             
-            # Build FFmpeg command
-            cmd = self._build_ffmpeg_command(input_path, output_path)
+            # Build FFmpeg command (a stream copy if only the container is wrong)
+            cmd = self._build_ffmpeg_command(input_path, output_path, input_info)
             
             logger.info(f"Encoding: {os.path.basename(input_path)}")
             logger.info(f"Command: {' '.join(cmd)}")
             
-            # Run FFmpeg with progress monitoring
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            
-            # Monitor progress
-            progress = 0.0
-            while True:
-                output = process.stderr.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                
-                if output:
-                    # Parse FFmpeg progress
-                    if 'time=' in output:
-                        progress = self._parse_ffmpeg_progress(output, duration)
-                        if progress_callback:
-                            progress_callback(progress)
+            # ffmpeg only prints errors; progress, when wanted, comes as
+            # key=value lines on stdout from -progress instead of status lines
+            quiet = ['-nostats', '-loglevel', 'error']
+            if progress_callback is None:
+                result = subprocess.run(
+                    cmd[:1] + quiet + cmd[1:],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE
+                )
+                return_code, stderr = result.returncode, result.stderr
+            else:
+                # stderr goes to a temp file so a flood of decode errors can
+                # never fill an unread pipe and stall ffmpeg
+                with tempfile.TemporaryFile() as err_file:
+                    process = subprocess.Popen(
+                        cmd[:1] + ['-progress', 'pipe:1'] + quiet + cmd[1:],
+                        stdout=subprocess.PIPE,
+                        stderr=err_file
+                    )
+                    with process.stdout:
+                        for line in process.stdout:
+                            key, _, value = line.partition(b'=')
+                            if key == b'out_time_us' and duration > 0:
+                                try:
+                                    seconds = int(value) / 1e6
+                                except ValueError:  # N/A before the first frame
+                                    continue
+                                progress_callback(min(100.0, max(0.0, seconds / duration * 100)))
+                            elif key == b'progress' and value.strip() == b'end':
+                                progress_callback(100.0)
+                    return_code = process.wait()
+                    err_file.seek(0)
+                    stderr = err_file.read()
             
             # Check result
-            return_code = process.poll()
             if return_code == 0:
                 logger.info(f"Encoding completed: {os.path.basename(output_path)}")
                 return True
-            else:
-                stderr = process.stderr.read()
-                logger.error(f"Encoding failed: {stderr}")
-                return False
+            # The last lines carry the actual failure; decode errors can run to thousands
+            error_tail = '\n'.join(stderr.decode('utf-8', 'replace').strip().splitlines()[-20:])
+            logger.error(f"Encoding failed: {error_tail}")
+            return False
                 
         except Exception as e:
             logger.error(f"Encoding error: {e}")
             return False
     
-    def _build_ffmpeg_command(self, input_path: str, output_path: str) -> List[str]:
-        """Build FFmpeg command for Pi optimization."""
+    def video_stream_ok(self, info: dict) -> bool:
+        """True if the video stream can be copied into the output unchanged.
+        
+        Beyond needs_encoding's codec, size and rate checks, the stream must be
+        8-bit 4:2:0 High/Main within level 4.2 and, as far as ffprobe can tell,
+        below the re-encode bitrate cap. Unknown values count as failures.
+        """
+        level = info.get('level')
+        return (info['codec'] == 'h264'
+                and info['width'] == 1920 and info['height'] == 1080
+                and abs(info['fps'] - 30.0) <= 1.0
+                and info.get('pix_fmt') == COPY_PIX_FMT
+                and info.get('profile') in COPY_PROFILES
+                and level is not None and 0 < level <= COPY_MAX_LEVEL
+                and 0 < info.get('bitrate', 0) < self._parse_rate(self.target_specs['maxrate']))
+    
+    @staticmethod
+    def _parse_rate(rate: str) -> int:
+        """Parse an FFmpeg rate such as '8M' or '6000k' into bits per second."""
+        scale = {'k': 1_000, 'M': 1_000_000}.get(rate[-1:], 1)
+        return int(float(rate[:-1] if scale > 1 else rate) * scale)
+    
+    def _build_ffmpeg_command(self, input_path: str, output_path: str,
+                              input_info: Optional[dict] = None) -> List[str]:
+        """Build FFmpeg command for Pi optimization.
+        
+        If input_info shows the video stream is already on target, the stream
+        is copied into a new MP4 instead of being re-encoded.
+        """
+        if input_info and self.video_stream_ok(input_info):
+            return [
+                'ffmpeg',
+                '-i', input_path,
+                '-y',  # Overwrite output
+                '-c:v', 'copy',
+                '-movflags', '+faststart',  # Optimize for streaming
+                '-an',  # No audio
+                '-f', self.target_specs['format'],
+                output_path
+            ]
+        
+        if self.hw_encoder:
+            # The hardware block takes a target bitrate; x264's profile/level/
+            # preset/crf options are rejected
+            return [
+                'ffmpeg',
+                '-i', input_path,
+                '-y',  # Overwrite output
+                '-c:v', self.hw_encoder,
+                '-b:v', self.target_specs['hw_bitrate'],
+                '-s', self.target_specs['resolution'],
+                '-r', str(self.target_specs['fps']),
+                '-pix_fmt', 'yuv420p',  # Pi-compatible pixel format
+                '-movflags', '+faststart',  # Optimize for streaming
+                '-an',  # No audio
+                '-f', self.target_specs['format'],
+                output_path
+            ]
+        
         cmd = [
             'ffmpeg',
             '-i', input_path,
@@ -204,49 +407,29 @@ class VideoEncoder:
             '-level:v', self.target_specs['level'],
             '-preset', self.target_specs['preset'],
             '-crf', str(self.target_specs['crf']),
+            '-maxrate', self.target_specs['maxrate'],
+            '-bufsize', self.target_specs['bufsize'],
             '-s', self.target_specs['resolution'],
             '-r', str(self.target_specs['fps']),
             '-pix_fmt', 'yuv420p',  # Pi-compatible pixel format
             '-movflags', '+faststart',  # Optimize for streaming
             '-an',  # No audio
             '-f', self.target_specs['format'],
-            output_path
         ]
+        if self.threads:
+            cmd += ['-threads', str(self.threads)]
+        cmd.append(output_path)
         
         return cmd
-    
-    def _parse_ffmpeg_progress(self, output_line: str, total_duration: float) -> float:
-        """Parse progress from FFmpeg output."""
-        try:
-            if 'time=' in output_line:
-                # Extract time=HH:MM:SS.ss
-                time_part = output_line.split('time=')[1].split()[0]
-                
-                # Parse time format
-                if ':' in time_part:
-                    parts = time_part.split(':')
-                    if len(parts) == 3:
-                        hours = float(parts[0])
-                        minutes = float(parts[1])
-                        seconds = float(parts[2])
-                        current_time = hours * 3600 + minutes * 60 + seconds
-                        
-                        if total_duration > 0:
-                            progress = min(100.0, (current_time / total_duration) * 100)
-                            return progress
-            
-            return 0.0
-            
-        except (ValueError, IndexError):
-            return 0.0
 
 class VideoBatchProcessor:
     """Batch processor for multiple video files."""
     
-    def __init__(self, media_dir: str = "media"):
+    def __init__(self, media_dir: str = "media", preset: str = "medium",
+                 cache_path: Optional[str] = None, hw_encode: bool = True):
         self.media_dir = Path(media_dir)
-        self.encoder = VideoEncoder()
-        self.supported_formats = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm']
+        self.encoder = VideoEncoder(preset, cache_path, hw_encode)
+        self.supported_formats = frozenset({'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm'})
     
     def scan_for_videos(self) -> List[Path]:
         """Scan media directory for video files."""
@@ -254,15 +437,39 @@ class VideoBatchProcessor:
         
         for folder in ['active', 'ambient']:
             folder_path = self.media_dir / folder
-            if folder_path.exists():
-                for file_path in folder_path.iterdir():
-                    if file_path.suffix.lower() in self.supported_formats:
-                        videos.append(file_path)
+            if not folder_path.is_dir():
+                continue
+            # scandir entries carry their type, so only matches become Paths
+            with os.scandir(folder_path) as entries:
+                for entry in entries:
+                    if (os.path.splitext(entry.name)[1].lower() in self.supported_formats
+                            and entry.is_file()):
+                        videos.append(Path(entry.path))
         
         return videos
     
-    def process_batch(self, videos: List[Path], keep_originals: bool = True) -> dict:
-        """Process a batch of videos."""
+    def check_all(self, videos: List[Path]) -> List[Tuple[bool, str]]:
+        """Run needs_encoding for every video, probing in parallel.
+        
+        Each probe is an ffprobe subprocess, so threads overlap the waits.
+        Results are returned in the same order as videos, and new probe
+        results are saved to the encoder's cache file, if it has one.
+        """
+        if not videos:
+            return []
+        workers = min(PROBE_WORKERS, len(videos))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(self.encoder.needs_encoding, map(str, videos)))
+        self.encoder.save_info_cache()
+        return results
+    
+    def process_batch(self, videos: List[Path], keep_originals: bool = True,
+                      jobs: int = 1) -> dict:
+        """Process a batch of videos.
+        
+        Up to jobs encodes run at once (each is its own ffmpeg process). Keep
+        jobs at 1 with the Pi's hardware encoder, which is a single block.
+        """
         results = {
             'processed': [],
             'skipped': [],
@@ -270,56 +477,82 @@ class VideoBatchProcessor:
             'total': len(videos)
         }
         
-        for i, video_path in enumerate(videos, 1):
-            logger.info(f"\n=== Processing {i}/{len(videos)}: {video_path.name} ===")
-            
-            # Check if encoding needed
-            needs_encoding, reason = self.encoder.needs_encoding(str(video_path))
-            
+        # Check which videos need encoding
+        to_encode = []
+        for video_path, (needs_encoding, reason) in zip(videos, self.check_all(videos)):
             if not needs_encoding:
-                logger.info(f"Skipping: {reason}")
+                logger.info(f"Skipping {video_path.name}: {reason}")
                 results['skipped'].append(str(video_path))
-                continue
-            
-            logger.info(f"Encoding needed: {reason}")
-            
-            # Determine output path
-            if keep_originals:
-                # Create encoded version alongside original
-                output_path = video_path.with_suffix('.encoded.mp4')
             else:
-                # Create backup and replace
-                backup_path = video_path.with_suffix(f'{video_path.suffix}.backup')
-                shutil.move(str(video_path), str(backup_path))
-                output_path = video_path.with_suffix('.mp4')
-            
-            # Encode video
+                logger.info(f"Encoding needed for {video_path.name}: {reason}")
+                to_encode.append(video_path)
+        
+        if jobs <= 1 or len(to_encode) <= 1:
+            outcomes = []
+            for i, video_path in enumerate(to_encode, 1):
+                logger.info(f"\n=== Processing {i}/{len(to_encode)}: {video_path.name} ===")
+                outcomes.append(self._encode_one(video_path, keep_originals, show_progress=True))
+        else:
+            # Split the cores between the encodes instead of running
+            # workers x cores x264 threads
+            workers = min(jobs, len(to_encode))
+            self.encoder.threads = max(1, (os.cpu_count() or 1) // workers)
+            try:
+                # Interleaved progress lines would be unreadable, so only log results
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    outcomes = list(executor.map(
+                        lambda video_path: self._encode_one(video_path, keep_originals, show_progress=False),
+                        to_encode))
+            finally:
+                self.encoder.threads = None
+        
+        for processed, failed in outcomes:
+            if processed:
+                results['processed'].append(processed)
+            if failed:
+                results['failed'].append(failed)
+        
+        return results
+    
+    def _encode_one(self, video_path: Path, keep_originals: bool,
+                    show_progress: bool) -> Tuple[Optional[str], Optional[str]]:
+        """Encode one video; returns (processed output path, failed input path)."""
+        # Determine output path
+        if keep_originals:
+            # Create encoded version alongside original
+            input_path = video_path
+            output_path = video_path.with_suffix('.encoded.mp4')
+        else:
+            # Create backup and replace, encoding from the backup
+            input_path = video_path.with_suffix(f'{video_path.suffix}.backup')
+            shutil.move(str(video_path), str(input_path))
+            output_path = video_path.with_suffix('.mp4')
+        
+        # Encode video
+        progress_cb = None
+        if show_progress:
             def progress_cb(progress):
                 print(f"\rEncoding progress: {progress:.1f}%", end='', flush=True)
-            
-            success = self.encoder.encode_video(str(video_path), str(output_path), progress_cb)
+        
+        success = self.encoder.encode_video(str(input_path), str(output_path), progress_cb)
+        if show_progress:
             print()  # New line after progress
-            
-            if success:
-                logger.info(f"Successfully encoded: {output_path.name}")
-                results['processed'].append(str(output_path))
-                
-                # Verify output
-                if not output_path.exists() or output_path.stat().st_size == 0:
-                    logger.error(f"Output file is empty or missing: {output_path}")
-                    results['failed'].append(str(video_path))
-                    
-            else:
-                logger.error(f"Failed to encode: {video_path.name}")
-                results['failed'].append(str(video_path))
-                
-                # Restore backup if we moved original
-                if not keep_originals:
-                    backup_path = video_path.with_suffix(f'{video_path.suffix}.backup')
-                    if backup_path.exists():
-                        shutil.move(str(backup_path), str(video_path))
         
-        return results
+        if success:
+            logger.info(f"Successfully encoded: {output_path.name}")
+            
+            # Verify output
+            if not output_path.exists() or output_path.stat().st_size == 0:
+                logger.error(f"Output file is empty or missing: {output_path}")
+                return str(output_path), str(video_path)
+            return str(output_path), None
+        
+        logger.error(f"Failed to encode: {video_path.name}")
+        
+        # Restore backup if we moved original
+        if not keep_originals and input_path.exists():
+            shutil.move(str(input_path), str(video_path))
+        return None, str(video_path)
 
 def print_video_info(video_path: str):
     """Print detailed video information."""
@@ -357,6 +590,7 @@ Examples:
   python encode_video.py --encode video.mp4       # Encode single video
   python encode_video.py --batch                  # Encode all videos
   python encode_video.py --batch --replace        # Encode and replace originals
+  python encode_video.py --batch --preset veryfast # Faster encode, larger files
         """
     )
     
@@ -396,6 +630,27 @@ Examples:
         help='Replace original files (creates .backup copies)'
     )
     
+    parser.add_argument(
+        '--preset',
+        choices=X264_PRESETS,
+        default='medium',
+        help='x264 speed preset; faster presets trade file size for encode time (default: medium)'
+    )
+    
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Encode up to N videos at once in --batch mode (default: 1; keep 1 with the hardware encoder)'
+    )
+    
+    parser.add_argument(
+        '--software',
+        action='store_true',
+        help="Always encode with libx264, even if the Pi's hardware encoder is available"
+    )
+    
     parser.add_argument(
         '--media-dir',
         default='media',
@@ -420,7 +675,7 @@ def main():
         logging.getLogger().setLevel(logging.DEBUG)
     
     # Initialize encoder
-    encoder = VideoEncoder()
+    encoder = VideoEncoder(args.preset, hw_encode=not args.software)
     if not encoder.ffmpeg_available:
         print("❌ FFmpeg is required but not available.")
         print("Install with: sudo apt install ffmpeg")
@@ -430,7 +685,7 @@ def main():
         # Handle different modes
         if args.scan:
             # Scan media folder
-            processor = VideoBatchProcessor(args.media_dir)
+            processor = VideoBatchProcessor(args.media_dir, args.preset, DEFAULT_INFO_CACHE, not args.software)
             videos = processor.scan_for_videos()
             
             if not videos:
@@ -439,8 +694,7 @@ def main():
             
             print(f"Found {len(videos)} videos in {args.media_dir}/:")
             
-            for video_path in videos:
-                needs_encoding, reason = encoder.needs_encoding(str(video_path))
+            for video_path, (needs_encoding, reason) in zip(videos, processor.check_all(videos)):
                 status = "⚠️  Needs encoding" if needs_encoding else "✅ Ready"
                 print(f"  {video_path.relative_to(args.media_dir)}: {status}")
                 if needs_encoding:
@@ -489,7 +743,7 @@ def main():
         
         elif args.batch:
             # Batch process
-            processor = VideoBatchProcessor(args.media_dir)
+            processor = VideoBatchProcessor(args.media_dir, args.preset, DEFAULT_INFO_CACHE, not args.software)
             videos = processor.scan_for_videos()
             
             if not videos:
@@ -498,7 +752,7 @@ def main():
             
             print(f"Found {len(videos)} videos for batch processing")
             
-            results = processor.process_batch(videos, keep_originals=not args.replace)
+            results = processor.process_batch(videos, keep_originals=not args.replace, jobs=args.jobs)
             
             # Print summary
             print(f"\n=== Batch Processing Complete ===")
@@ -21,6 +21,15 @@ class MaskEditor:
         # Create test pattern
         self.test_pattern = self._create_test_pattern()
         
+        # The pattern is static, so scale it to the editing window once and
+        # draw each frame's overlay at display resolution in a reused buffer
+        self.display_scale = 1280 / 1920
+        self._display_pattern = cv2.resize(self.test_pattern, (1280, 720), interpolation=cv2.INTER_AREA)
+        self._display_buf = np.empty_like(self._display_pattern)
+        
+        # Only redraw after something changed; the scene is otherwise static
+        self._dirty = True
+        
         # Setup window
         cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
         cv2.resizeWindow(self.window_name, 1280, 720)  # Scaled down for editing
@@ -31,28 +40,20 @@ class MaskEditor:
     
     def _create_test_pattern(self) -> np.ndarray:
         """Create a test pattern to help visualize mask alignment."""
-        pattern = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        pattern = np.empty((1080, 1920, 3), dtype=np.uint8)
         
-        # Create grid pattern
-        grid_size = 100
-        for y in range(0, 1080, grid_size):
-            cv2.line(pattern, (0, y), (1920, y), (100, 100, 100), 1)
-        for x in range(0, 1920, grid_size):
-            cv2.line(pattern, (x, 0), (x, 1080), (100, 100, 100), 1)
+        # One color per stair: convert all six hues in a single call
+        hues = np.arange(6, dtype=np.uint8) * 30
+        stair_hsv = np.stack([hues, np.full(6, 255, np.uint8), np.full(6, 200, np.uint8)], axis=1)
+        stair_bgr = cv2.cvtColor(stair_hsv.reshape(6, 1, 3), cv2.COLOR_HSV2BGR).reshape(6, 3)
         
-        # Draw stair outlines
+        # Draw stair outlines (the six fills cover the whole frame)
         for i in range(6):
             y_start = i * 180
             y_end = (i + 1) * 180
             
-            # Different color for each stair
-            hue = int(i * 180 / 6)
-            color_hsv = np.uint8([[[hue, 255, 200]]])
-            color_bgr = cv2.cvtColor(color_hsv, cv2.COLOR_HSV2BGR)[0][0]
-            color = (int(color_bgr[0]), int(color_bgr[1]), int(color_bgr[2]))
-            
-            # Fill with semi-transparent color
-            cv2.rectangle(pattern, (0, y_start), (1920, y_end), color, -1)
+            # Fill with the stair color
+            cv2.rectangle(pattern, (0, y_start), (1920, y_end), stair_bgr[i].tolist(), -1)
             
             # Add stair number
             cv2.putText(pattern, f"STAIR {i + 1}", 
@@ -74,6 +75,10 @@ class MaskEditor:
         full_y = int(y * scale_y)
         
         self.mask_manager.handle_mouse_event(event, full_x, full_y, flags, param)
+        
+        # Plain hovering changes nothing on screen
+        if event != cv2.EVENT_MOUSEMOVE or self.mask_manager.mouse_dragging:
+            self._dirty = True
     
     def run(self):
         """Run the mask editor."""
@@ -91,36 +96,40 @@ class MaskEditor:
         show_help = True
         
         while True:
-            # Create display frame
-            display_frame = self.test_pattern.copy()
-            
-            # Apply mask overlay
-            self.mask_manager.draw_edit_overlay(display_frame)
-            
-            # Add help text
-            if show_help:
-                help_text = [
-                    "MASK EDITOR - Adjust corners to match physical stairs",
-                    "S: Save | R: Reset | H: Toggle help | ESC/Q: Quit"
-                ]
+            if self._dirty:
+                # Create display frame
+                np.copyto(self._display_buf, self._display_pattern)
+                display_frame = self._display_buf
                 
-                for i, text in enumerate(help_text):
-                    cv2.putText(display_frame, text, (10, display_frame.shape[0] - 60 + i * 25),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Scale down for display
-            display_scaled = cv2.resize(display_frame, (1280, 720))
-            cv2.imshow(self.window_name, display_scaled)
+                # Apply mask overlay
+                self.mask_manager.draw_edit_overlay(display_frame, scale=self.display_scale)
+                
+                # Add help text
+                if show_help:
+                    help_text = [
+                        "MASK EDITOR - Adjust corners to match physical stairs",
+                        "S: Save | R: Reset | H: Toggle help | ESC/Q: Quit"
+                    ]
+                
+                    for i, text in enumerate(help_text):
+                        cv2.putText(display_frame, text, (10, display_frame.shape[0] - 60 + i * 25),
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                
+                cv2.imshow(self.window_name, display_frame)
+                self._dirty = False
             
-            # Handle keyboard input
-            key = cv2.waitKey(30) & 0xFF
+            # Handle keyboard input; poll quickly only while a drag is in progress
+            key = cv2.waitKey(15 if self.mask_manager.mouse_dragging else 100) & 0xFF
             
             if key == 27 or key == ord('q'):  # ESC or Q
                 break
             elif key == ord('h'):
                 show_help = not show_help
+                self._dirty = True
             elif key != 255:
                 handled = self.mask_manager.handle_keyboard_event(key)
+                if handled:
+                    self._dirty = True
                 if handled and key == ord('s'):
                     print("✅ Mask configuration saved!")
                 elif handled and key == ord('r'):
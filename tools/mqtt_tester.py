@@ -8,21 +8,45 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 import time
-import json
-import threading
+import select
 from mqtt_handler import MQTTSimulator
 
+# Waiting for a command with select() lets the tester report broker drops and
+# reconnects while idle; Windows can't select() on stdin, so it uses input()
+STDIN_SELECT = os.name == 'posix'
+
+# Automated demo steps: (state, media, seconds to hold)
+DEMO_SEQUENCE = (
+    ("ambient", "ambient_01", 2),
+    ("active", "active_01", 3),
+    ("ambient", "ambient_01", 2),
+    ("active", "active_02", 3),
+    ("ambient", None, 2),
+)
+
 class MQTTTester:
     """Interactive MQTT testing tool."""
     
     def __init__(self, broker_host: str = "localhost", broker_port: int = 1883):
         self.simulator = MQTTSimulator(broker_host, broker_port)
         self.is_connected = False
+        self._link_up = False  # Last broker state reported to the user
+        self._stdin_pending = b''  # Raw stdin bytes not yet returned as lines
+        
+        # Interactive commands ('q' / 'quit' / 'exit' end the loop)
+        self._commands = {
+            '1': self._cmd_active, 'a': self._cmd_active, 'active': self._cmd_active,
+            '2': self._cmd_ambient, 'b': self._cmd_ambient, 'ambient': self._cmd_ambient,
+            'm': self.run_motion_sequence,
+            's': self.show_status,
+            'help': self._cmd_help,
+        }
     
     def connect(self) -> bool:
         """Connect to MQTT broker."""
         print(f"Connecting to MQTT broker at {self.simulator.broker_host}:{self.simulator.broker_port}...")
         self.is_connected = self.simulator.connect()
+        self._link_up = self.is_connected
         
         if self.is_connected:
             print("✅ Connected to MQTT broker")
@@ -47,15 +71,49 @@ class MQTTTester:
         
         success = self.simulator.send_message(state, media)
         if success:
-            print(f"📤 Sent: state={state}, media={media}")
+            # Flush so piped output (e.g. | tee) keeps pace with the sleeps between sends
+            print(f"📤 Sent: state={state}, media={media}", flush=True)
         else:
             print(f"❌ Failed to send message")
         
         return success
     
+    def _read_line(self, prompt: str) -> str:
+        """Read one input line, reporting broker connection changes while waiting.
+        
+        Reads the raw stdin descriptor and splits lines here: select() only sees
+        bytes the kernel still holds, so lines a buffered readline() had already
+        pulled in (several pasted at once) would sit unseen until more input.
+        """
+        if not STDIN_SELECT:
+            return input(prompt)
+        
+        print(prompt, end='', flush=True)
+        fd = sys.stdin.fileno()
+        while b'\n' not in self._stdin_pending:
+            ready, _, _ = select.select([fd], [], [], 0.5)
+            if ready:
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    if not self._stdin_pending:
+                        raise EOFError
+                    break  # Last line had no trailing newline
+                self._stdin_pending += chunk
+                continue
+            
+            # The simulator reconnects on its own; tell the user when the link changes
+            link_up = self.is_connected and self.simulator.is_connected
+            if link_up != self._link_up:
+                self._link_up = link_up
+                notice = "✅ Reconnected to MQTT broker" if link_up else "⚠️  Lost MQTT broker connection, retrying..."
+                print(f"\n{notice}\n{prompt}", end='', flush=True)
+        
+        line, _, self._stdin_pending = self._stdin_pending.partition(b'\n')
+        return line.decode(sys.stdin.encoding or 'utf-8', errors='replace')
+    
     def run_motion_sequence(self):
         """Simulate a motion detection sequence."""
-        print("\n🎬 Running motion detection sequence...")
+        print("\n🎬 Running motion detection sequence...", flush=True)
         
         # Motion detected
         self.send_message("active", "active_01")
@@ -81,32 +139,14 @@ class MQTTTester:
         
         while True:
             try:
-                cmd = input("Command: ").lower().strip()
+                cmd = self._read_line("Command: ").lower().strip()
                 
-                if cmd in ['q', 'quit', 'exit']:
+                if cmd in ('q', 'quit', 'exit'):
                     break
                 
-                elif cmd in ['1', 'a', 'active']:
-                    media = input("Media ID (or Enter for active_01): ").strip()
-                    if not media:
-                        media = "active_01"
-                    self.send_message("active", media)
-                
-                elif cmd in ['2', 'b', 'ambient']:
-                    media = input("Media ID (or Enter for ambient_01): ").strip()
-                    if not media:
-                        media = "ambient_01"
-                    self.send_message("ambient", media)
-                
-                elif cmd == 'm':
-                    self.run_motion_sequence()
-                
-                elif cmd == 's':
-                    self.show_status()
-                
-                elif cmd == 'help':
-                    print("Commands: 1/a (active), 2/b (ambient), m (motion), s (status), q (quit)")
-                
+                handler = self._commands.get(cmd)
+                if handler:
+                    handler()
                 else:
                     print(f"Unknown command: {cmd}. Type 'help' for commands.")
             
@@ -117,27 +157,33 @@ class MQTTTester:
         
         print("\nExiting interactive mode...")
     
+    def _cmd_active(self):
+        """Prompt for a media ID and send an active message."""
+        media = self._read_line("Media ID (or Enter for active_01): ").strip()
+        self.send_message("active", media or "active_01")
+    
+    def _cmd_ambient(self):
+        """Prompt for a media ID and send an ambient message."""
+        media = self._read_line("Media ID (or Enter for ambient_01): ").strip()
+        self.send_message("ambient", media or "ambient_01")
+    
+    def _cmd_help(self):
+        """Print the one-line command summary."""
+        print("Commands: 1/a (active), 2/b (ambient), m (motion), s (status), q (quit)")
+    
     def show_status(self):
         """Show current tester status."""
         print(f"MQTT Tester Status:")
         print(f"  Broker: {self.simulator.broker_host}:{self.simulator.broker_port}")
         print(f"  Topic: {self.simulator.topic}")
-        print(f"  Connected: {self.is_connected}")
+        print(f"  Connected: {self.is_connected and self.simulator.is_connected}")
     
     def run_automated_demo(self):
         """Run automated demo sequence."""
         print("\n🎭 Running automated demo sequence...")
         
-        sequences = [
-            ("ambient", "ambient_01", 2),
-            ("active", "active_01", 3),
-            ("ambient", "ambient_01", 2),
-            ("active", "active_02", 3),
-            ("ambient", None, 2),
-        ]
-        
-        for i, (state, media, duration) in enumerate(sequences, 1):
-            print(f"\nStep {i}/{len(sequences)}: {state} / {media} for {duration}s")
+        for i, (state, media, duration) in enumerate(DEMO_SEQUENCE, 1):
+            print(f"\nStep {i}/{len(DEMO_SEQUENCE)}: {state} / {media} for {duration}s", flush=True)
             self.send_message(state, media)
             time.sleep(duration)
         
@@ -179,7 +225,7 @@ def main():
         print("3. Single motion sequence")
         
         try:
-            choice = input("\nChoice (1-3): ").strip()
+            choice = tester._read_line("\nChoice (1-3): ").strip()
         except EOFError:
             choice = "2"  # Default for non-interactive environments
         
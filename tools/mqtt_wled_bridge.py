@@ -16,8 +16,12 @@ except ImportError:  # pragma: no cover
     print("This tool requires paho-mqtt. Install with: pip install paho-mqtt", file=sys.stderr)
     sys.exit(1)
 
+# Reuse the projector's TCP tuning (TCP_NODELAY) for the bridge's sockets
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from net_tuning import tune_socket
+
 try:
-    from urllib.request import urlopen
+    from urllib.request import Request, urlopen
     from urllib.error import URLError, HTTPError
 except ImportError:  # pragma: no cover
     urlopen = None  # type: ignore
@@ -25,6 +29,15 @@ except ImportError:  # pragma: no cover
 
 LOG = logging.getLogger("mqtt_wled_bridge")
 
+# WLED state reports are large (segments, nightlight, ...); all we need is the
+# preset slot, which WLED serializes as a top-level integer "ps"
+_PS_RE = re.compile(rb'"ps"\s*:\s*(-?\d+)')
+
+# Intentional: QoS 0 both ways. This is a realtime trigger; broker ACK round
+# trips would add latency, and a dropped preset change is superseded by the
+# next WLED state report anyway.
+_QOS = 0
+
 
 def load_mapping(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
     if not path:
@@ -66,6 +79,23 @@ def fetch_wled_presets(wled_host: Optional[str], timeout: float = 3.0) -> Dict[s
         return {}
 
 
+def refresh_wled_presets(
+    wled_host: str, etag: Optional[str], timeout: float = 3.0
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Re-fetch presets.json, returning (presets, etag), or (None, etag) if unchanged or unreachable."""
+    url = f"http://{wled_host}/presets.json"
+    request = Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urlopen(request, timeout=timeout) as resp:
+            return json.loads(resp.read().decode("utf-8", errors="ignore")), resp.headers.get("ETag")
+    except HTTPError as e:
+        if e.code != 304:
+            LOG.debug("Presets refresh from %s failed: %s", url, e)
+    except (URLError, OSError, ValueError) as e:
+        LOG.debug("Presets refresh from %s failed: %s", url, e)
+    return None, etag
+
+
 def resolve_media_state(
     ps_value: Optional[int],
     presets: Dict[str, Any],
@@ -129,6 +159,8 @@ class Bridge:
         start_after_ms: Optional[int],
         verbose: bool,
         dedupe_seconds: float,
+        presets_refresh_seconds: float = 0.0,
+        client: Optional[mqtt.Client] = None,
     ) -> None:
         self.broker = broker
         self.port = port
@@ -139,24 +171,37 @@ class Bridge:
         self.wled_host = wled_host
         self.mapping = load_mapping(mapping_path)
         self.presets = fetch_wled_presets(wled_host)
+        self.presets_refresh_seconds = presets_refresh_seconds
+        self._presets_etag: Optional[str] = None
+        self._refresh_stop = threading.Event()
         self.start_after_ms = start_after_ms
         self.verbose = verbose
         self.dedupe_seconds = dedupe_seconds
         self._last_ps_sent: Optional[int] = None
+        # Preset slot -> (media, state); replaced with an empty dict whenever the
+        # presets refresh picks up a change, so each slot resolves once per version
+        self._resolved: Dict[int, Optional[Tuple[str, str]]] = {}
+        # Encoded playback payloads per (media, state); start_after_ms is fixed too
+        self._payloads: Dict[Tuple[str, str], bytes] = {}
         self._last_sent_ts: float = 0.0
 
-        self.client = mqtt.Client()
-        if username:
-            self.client.username_pw_set(username, password or "")
+        # A harness that also publishes test messages can pass in its client so
+        # both share one broker connection. The bridge takes over the client's
+        # connect/message callbacks; credentials are then the caller's concern.
+        if client is None:
+            client = mqtt.Client()
+            if username:
+                client.username_pw_set(username, password or "")
+        self.client = client
+        self.client.on_socket_open = tune_socket
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
         self.client.on_disconnect = self._on_disconnect
-        self._stop = threading.Event()
 
     def _on_connect(self, client, userdata, flags, rc):  # noqa: D401
         if rc == 0:
             LOG.info("Connected to MQTT broker %s:%s", self.broker, self.port)
-            client.subscribe(self.wled_state_topic, qos=0)
+            client.subscribe(self.wled_state_topic, qos=_QOS)
             LOG.info("Subscribed to %s", self.wled_state_topic)
         else:
             LOG.error("MQTT connection failed with code %s", rc)
@@ -166,36 +211,38 @@ class Bridge:
             LOG.warning("Unexpected MQTT disconnect (rc=%s). Reconnecting...", rc)
 
     def _publish_playback(self, media: str, state: str):
-        payload: Dict[str, Any] = {"state": state, "media": media}
-        if self.start_after_ms is not None:
-            payload["start_after_ms"] = int(self.start_after_ms)
-        data = json.dumps(payload, separators=(",", ":"))
+        data = self._payloads.get((media, state))
+        if data is None:
+            payload: Dict[str, Any] = {"state": state, "media": media}
+            if self.start_after_ms is not None:
+                payload["start_after_ms"] = int(self.start_after_ms)
+            data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            self._payloads[(media, state)] = data
         if self.verbose:
-            LOG.info("Publish %s => %s", self.publish_topic, data)
-        self.client.publish(self.publish_topic, data, qos=0, retain=False)
+            LOG.info("Publish %s => %s", self.publish_topic, data.decode("utf-8"))
+        self.client.publish(self.publish_topic, data, qos=_QOS, retain=False)
 
     def _on_message(self, client, userdata, msg):
-        try:
-            payload = json.loads(msg.payload.decode("utf-8", errors="ignore"))
-        except json.JSONDecodeError:
-            LOG.debug("Non-JSON payload on %s; ignoring", msg.topic)
+        match = _PS_RE.search(msg.payload)
+        if match is None:
+            # Not a state report with a preset slot; ignore
+            LOG.debug("No preset slot in payload on %s; ignoring", msg.topic)
             return
-
-        # WLED state JSON includes "ps" for current preset slot
-        ps_value = None
-        if isinstance(payload, dict):
-            ps_value = payload.get("ps")
-            # Some payloads may embed state under keys; ignore if missing
-            if not isinstance(ps_value, int):
-                # If no preset present, ignore
-                return
+        ps_value = int(match.group(1))
 
         # Dedupe identical preset reports within a small window
-        now = time.time()
+        now = time.monotonic()
         if self._last_ps_sent == ps_value and (now - self._last_sent_ts) < self.dedupe_seconds:
             return
 
-        resolved = resolve_media_state(ps_value, self.presets, self.mapping)
+        # Cache before presets: the refresh swaps presets first, so a stale
+        # resolution can only land in a cache that is already discarded
+        cache = self._resolved
+        presets = self.presets
+        try:
+            resolved = cache[ps_value]
+        except KeyError:
+            resolved = cache[ps_value] = resolve_media_state(ps_value, presets, self.mapping)
         if not resolved:
             return
         media, state = resolved
@@ -203,18 +250,27 @@ class Bridge:
         self._last_ps_sent = ps_value
         self._last_sent_ts = now
 
+    def _refresh_presets_loop(self):
+        """Pick up preset renames on the WLED device without restarting the bridge."""
+        while not self._refresh_stop.wait(self.presets_refresh_seconds):
+            presets, self._presets_etag = refresh_wled_presets(self.wled_host, self._presets_etag)
+            if presets is not None and presets != self.presets:
+                LOG.info("WLED presets changed; re-resolving preset slots")
+                # Swap references; the message thread never sees a half-built dict
+                self.presets = presets
+                self._resolved = {}
+
     def run(self):
-        self.client.connect(self.broker, self.port, keepalive=30)
-        try:
-            self.client.loop_start()
-            while not self._stop.is_set():
-                time.sleep(0.2)
-        finally:
-            self.client.loop_stop()
-            self.client.disconnect()
+        if self.wled_host and urlopen and self.presets_refresh_seconds > 0:
+            threading.Thread(target=self._refresh_presets_loop, name="wled-presets", daemon=True).start()
+        # paho's network loop runs on this thread, reconnecting (including the
+        # first connection) until stop() disconnects
+        self.client.connect_async(self.broker, self.port, keepalive=30)
+        self.client.loop_forever(retry_first_connection=True)
 
     def stop(self):
-        self._stop.set()
+        self._refresh_stop.set()
+        self.client.disconnect()
 
 
 def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
@@ -230,6 +286,7 @@ def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
     parser.add_argument("--publish-topic", default=os.environ.get("PLAYBACK_TOPIC", "halloween/playback"), help="Playback control topic to publish to")
     parser.add_argument("--mapping", help="Optional JSON mapping file for preset slot/name to media/state")
     parser.add_argument("--start-after-ms", type=int, default=None, help="Optional start-after buffer to include in payload (e.g., 250)")
+    parser.add_argument("--presets-refresh", type=float, default=60.0, metavar="SECONDS", help="Re-fetch WLED presets.json this often to pick up renames (0 disables; needs --wled-host)")
     parser.add_argument("--dedupe-seconds", type=float, default=1.0, help="Suppress duplicate publishes for the same preset within this window")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging")
     return parser.parse_args(argv)
@@ -251,13 +308,11 @@ def main(argv: Optional[list] = None) -> int:
         start_after_ms=args.start_after_ms,
         verbose=args.verbose,
         dedupe_seconds=args.dedupe_seconds,
+        presets_refresh_seconds=args.presets_refresh,
     )
 
-    stop_event = threading.Event()
-
     def handle_sig(signum, frame):  # noqa: ANN001
         LOG.info("Received signal %s, shutting down...", signum)
-        stop_event.set()
         bridge.stop()
 
     signal.signal(signal.SIGINT, handle_sig)